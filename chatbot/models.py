@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class ChatMessage(models.Model):
     ROLE_CHOICES = [('user', 'User'), ('assistant', 'Assistant')]
@@ -11,10 +12,37 @@ class ChatMessage(models.Model):
     )
     role = models.CharField(max_length=10, choices=ROLE_CHOICES)
     content = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: messages are written in batches after the fact and keep
+    # the time they were actually sent
+    timestamp = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['user', '-timestamp'], name='chatbot_msg_user_ts_idx'),
+            models.Index(fields=['timestamp'], name='chatbot_msg_ts_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.user.username} | {self.role} | {self.timestamp}"
\ No newline at end of file
+        return f"{self.user.username} | {self.role} | {self.timestamp}"
+
+class ArchivedChatMessage(models.Model):
+    """A chat message moved out of ChatMessage by prune_chat_messages after the retention period."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_chat_messages'
+    )
+    role = models.CharField(max_length=10, choices=ChatMessage.ROLE_CHOICES)
+    content = models.TextField()
+    timestamp = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['user', 'timestamp'], name='chatbot_archive_user_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} | {self.role} | {self.timestamp} (archived)"
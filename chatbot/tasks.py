@@ -0,0 +1,153 @@
+import json
+
+from celery import shared_task
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+
+from chatbot.models import ArchivedChatMessage, ChatMessage
+from services.chat_context import (
+    get_summary, pack_history, release_summary_refresh, store_summary, unsummarized,
+)
+from services.chat_history_service import (
+    ack_pending, acquire_flush_lock, cached_window, claim_pending, dead_letter, pending_to_messages,
+    record_flush_failure, release_flush_lock,
+)
+from services.chatbot_services import summarize_conversation
+
+User = get_user_model()
+
+FLUSH_BATCH_SIZE = 500
+MAX_FLUSH_ATTEMPTS = 5
+# Outlasts any one flush; if the worker dies, the next run resumes after it expires
+FLUSH_LOCK_TTL = 60
+RETENTION_DAYS = 180
+PRUNE_BATCH_SIZE = 5000
+
+
+@shared_task
+def flush_chat_messages():
+    """
+    Write chat messages queued in Redis by the chat views to Postgres in bulk.
+    Each batch sits in the processing list until its insert commits, so
+    delivery is at-least-once: a worker killed between commit and ack can
+    write a batch twice, but never loses one. A batch that keeps failing is
+    written row by row after MAX_FLUSH_ATTEMPTS, dead-lettering the rows that
+    still fail so they stop blocking the queue.
+    """
+    if not acquire_flush_lock(FLUSH_LOCK_TTL):
+        return "Flush already running"
+
+    flushed = 0
+    try:
+        while True:
+            raw_entries = claim_pending(FLUSH_BATCH_SIZE)
+            if not raw_entries:
+                break
+
+            messages, unparseable = pending_to_messages(raw_entries)
+            dead_letter(unparseable)
+            # Users deleted since they chatted would fail the whole batch on the FK
+            live_users = set(
+                User.objects.filter(id__in={m.user_id for m in messages}).values_list('id', flat=True)
+            )
+            messages = [m for m in messages if m.user_id in live_users]
+
+            try:
+                ChatMessage.objects.bulk_create(messages)
+            except Exception as e:
+                attempts = record_flush_failure()
+                print(f"Chat flush failed (attempt {attempts}), {len(raw_entries)} messages kept for retry: {e}")
+                if attempts < MAX_FLUSH_ATTEMPTS:
+                    break
+                flushed += _flush_one_by_one(messages)
+            else:
+                flushed += len(messages)
+            ack_pending()
+
+            if len(raw_entries) < FLUSH_BATCH_SIZE:
+                break
+    finally:
+        release_flush_lock()
+
+    return f"Flushed {flushed} chat messages"
+
+
+def _flush_one_by_one(messages: list) -> int:
+    """
+    Save a failing batch row by row. Rows the database rejects are
+    dead-lettered; anything else (the database being down) propagates and
+    leaves the batch unacknowledged for the next run.
+    """
+    saved = 0
+    for message in messages:
+        try:
+            message.save()
+            saved += 1
+        except (DataError, IntegrityError, ValueError) as e:
+            print(f"Chat message for user {message.user_id} dead-lettered: {e}")
+            dead_letter([json.dumps({
+                "user_id": message.user_id,
+                "role": message.role,
+                "content": message.content,
+                "timestamp": message.timestamp.isoformat() if message.timestamp else None,
+            })])
+    return saved
+
+
+@shared_task
+def prune_chat_messages():
+    """
+    Move chat messages older than RETENTION_DAYS to ArchivedChatMessage, in
+    index-sized batches. Each batch is copied and deleted in one transaction,
+    so a failure leaves it in place for the next run.
+    """
+    cutoff = timezone.now() - timedelta(days=RETENTION_DAYS)
+    archived = 0
+
+    while True:
+        with transaction.atomic():
+            batch = list(
+                ChatMessage.objects.filter(timestamp__lt=cutoff)
+                .order_by('timestamp')
+                .values('id', 'user_id', 'role', 'content', 'timestamp')[:PRUNE_BATCH_SIZE]
+            )
+            if not batch:
+                break
+            ArchivedChatMessage.objects.bulk_create([
+                ArchivedChatMessage(user_id=row['user_id'], role=row['role'], content=row['content'], timestamp=row['timestamp'])
+                for row in batch
+            ])
+            ChatMessage.objects.filter(id__in=[row['id'] for row in batch]).delete()
+        archived += len(batch)
+
+    return f"Archived {archived} chat messages older than {RETENTION_DAYS} days"
+
+
+@shared_task
+def refresh_chat_summary(user_id):
+    """
+    Fold the turns that no longer fit in the chat history budget into the
+    user's rolling summary. Queued by the chat views when prepare_context
+    finds dropped turns the summary doesn't cover yet.
+    """
+    try:
+        history = cached_window(user_id)
+        if not history:
+            return "No conversation window"
+
+        summary = get_summary(user_id)
+        dropped, _ = pack_history(history)
+        pending = unsummarized(dropped, summary)
+        if not pending:
+            return "Summary up to date"
+
+        text = summarize_conversation(summary["text"] if summary else None, pending)
+        if text is None:
+            return "Summary generation failed"
+
+        store_summary(user_id, text, through=pending[-1]["timestamp"])
+        return f"Summarised {len(pending)} messages"
+    finally:
+        release_summary_refresh(user_id)
@@ -1,3 +1,198 @@
-from django.test import TestCase
+import datetime
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
 
-# Create your tests here.
+import redis.asyncio
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chatbot.models import ArchivedChatMessage, ChatMessage
+from chatbot.tasks import MAX_FLUSH_ATTEMPTS, RETENTION_DAYS, flush_chat_messages, prune_chat_messages
+from services import chat_answer_cache, chat_context, chat_history_service
+from services.chat_history_service import _entry, claim_pending, load_window
+from services.chat_answer_cache import STATS_KEY, answer_cache_key, is_standalone_question
+from services.chatbot_services import PROMPT_VERSION
+from users.models import User
+
+TEST_PENDING_KEY = "chat:pending:test"
+
+
+def _completion(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+class StandaloneQuestionTests(TestCase):
+
+    def test_questions_with_their_own_topic_are_standalone(self):
+        for message in ("What is an IPO?", "what's ipo", "difference between NSE and BSE"):
+            self.assertTrue(is_standalone_question(message), message)
+
+    def test_follow_ups_and_personal_questions_are_not(self):
+        for message in ("why?", "is it a good buy?", "tell me more", "should I sell my shares", "what about that one"):
+            self.assertFalse(is_standalone_question(message), message)
+
+
+class ChatAnswerCacheTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='answer-cache', password='pw12345!')
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        self.keys = [
+            answer_cache_key("what is ipo", PROMPT_VERSION),
+            chat_history_service._window_key(self.user.id),
+            chat_history_service._loaded_key(self.user.id),
+            TEST_PENDING_KEY,
+        ]
+        chat_answer_cache.redis_client.delete(*self.keys)
+        self.groq = MagicMock()
+        self.groq.chat.completions.create = AsyncMock(return_value=_completion("An IPO is a company's first share sale."))
+        targets = [
+            patch('services.chatbot_services.async_client', self.groq),
+            patch.object(chat_history_service, 'PENDING_KEY', TEST_PENDING_KEY),
+        ]
+        # Fresh async clients per test: a module's client is bound to the first event loop it ran on
+        for module in (chat_answer_cache, chat_context, chat_history_service):
+            client = redis.asyncio.from_url(settings.REDIS_URL, decode_responses=True)
+            targets.append(patch.object(module, 'async_redis_client', client))
+        for target in targets:
+            target.start()
+            self.addCleanup(target.stop)
+
+    def tearDown(self):
+        chat_answer_cache.redis_client.delete(*self.keys)
+
+    def _stats(self):
+        stats = chat_answer_cache.redis_client.hgetall(STATS_KEY)
+        return int(stats.get('hits', 0)), int(stats.get('misses', 0))
+
+    async def _ask(self, message):
+        response = await self.async_client.post(
+            '/api/chatbot/message/', {'message': message}, content_type='application/json', headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['response']
+
+    async def test_repeated_question_hits_the_cache_despite_history(self):
+        hits, misses = self._stats()
+
+        first = await self._ask("What is an IPO?")
+        # The first turn is now in the user's window, so this request carries history
+        second = await self._ask("what's ipo")
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.groq.chat.completions.create.await_count, 1)
+        self.assertEqual(self._stats(), (hits + 1, misses + 1))
+
+    async def test_follow_up_skips_the_cache(self):
+        await self._ask("What is an IPO?")
+        hits, misses = self._stats()
+
+        await self._ask("is it a good investment?")
+
+        self.assertEqual(self.groq.chat.completions.create.await_count, 2)
+        self.assertEqual(self._stats(), (hits, misses))
+
+
+QUEUE_KEYS = {
+    'PENDING_KEY': 'chat:test:pending',
+    'PROCESSING_KEY': 'chat:test:processing',
+    'DEAD_KEY': 'chat:test:dead',
+    'FLUSH_LOCK_KEY': 'chat:test:flush_lock',
+    'FLUSH_ATTEMPTS_KEY': 'chat:test:attempts',
+}
+
+
+class ChatQueueTests(TransactionTestCase):
+    # Not TestCase: a failed bulk insert must not poison the test's own transaction
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='chat-queue', password='pw12345!')
+        self.redis = chat_history_service.redis_client
+        self.redis.delete(*QUEUE_KEYS.values())
+        for name, key in QUEUE_KEYS.items():
+            target = patch.object(chat_history_service, name, key)
+            target.start()
+            self.addCleanup(target.stop)
+
+    def tearDown(self):
+        self.redis.delete(*QUEUE_KEYS.values())
+
+    def _queue(self, *entries):
+        self.redis.rpush(QUEUE_KEYS['PENDING_KEY'], *entries)
+
+    def test_batch_claimed_by_a_crashed_flush_is_written_by_the_next(self):
+        self._queue(_entry(self.user.id, 'user', 'hi'), _entry(self.user.id, 'assistant', 'hello'))
+        # A worker claims the batch and dies before writing it
+        self.assertEqual(len(claim_pending(10)), 2)
+
+        flush_chat_messages()
+
+        self.assertEqual(list(ChatMessage.objects.values_list('content', flat=True)), ['hi', 'hello'])
+        self.assertEqual(self.redis.llen(QUEUE_KEYS['PROCESSING_KEY']), 0)
+
+    def test_unparseable_entries_are_dead_lettered(self):
+        self._queue('not json', _entry(self.user.id, 'user', 'hi'))
+
+        flush_chat_messages()
+
+        self.assertEqual(ChatMessage.objects.count(), 1)
+        self.assertEqual(self.redis.lrange(QUEUE_KEYS['DEAD_KEY'], 0, -1), ['not json'])
+
+    def test_rejected_row_stops_blocking_the_queue(self):
+        too_long = json.dumps({
+            'user_id': self.user.id, 'role': 'r' * 50, 'content': 'x', 'timestamp': timezone.now().isoformat(),
+        })
+        self._queue(_entry(self.user.id, 'user', 'hi'), too_long)
+
+        for _ in range(MAX_FLUSH_ATTEMPTS - 1):
+            flush_chat_messages()
+            self.assertEqual(ChatMessage.objects.count(), 0)
+        flush_chat_messages()
+
+        self.assertEqual(list(ChatMessage.objects.values_list('content', flat=True)), ['hi'])
+        self.assertEqual(self.redis.lrange(QUEUE_KEYS['DEAD_KEY'], 0, -1), [too_long])
+        self.assertEqual(self.redis.llen(QUEUE_KEYS['PROCESSING_KEY']), 0)
+
+    def test_old_messages_are_archived_before_they_are_deleted(self):
+        old = timezone.now() - datetime.timedelta(days=RETENTION_DAYS + 1)
+        ChatMessage.objects.create(user=self.user, role='user', content='old', timestamp=old)
+        ChatMessage.objects.create(user=self.user, role='user', content='recent')
+
+        prune_chat_messages()
+
+        self.assertEqual(list(ChatMessage.objects.values_list('content', flat=True)), ['recent'])
+        archived = ArchivedChatMessage.objects.get()
+        self.assertEqual((archived.user_id, archived.content, archived.timestamp), (self.user.id, 'old', old))
+
+
+class ChatWindowTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='chat-window', password='pw12345!')
+        self.redis = chat_history_service.redis_client
+        self.keys = [chat_history_service._window_key(self.user.id), chat_history_service._loaded_key(self.user.id)]
+        self.redis.delete(*self.keys)
+
+    def tearDown(self):
+        self.redis.delete(*self.keys)
+
+    def test_rebuild_keeps_turns_appended_while_it_read_postgres(self):
+        ChatMessage.objects.create(user=self.user, role='user', content='stored')
+        # Appended after the rebuild's Postgres read, before it reaches Redis
+        self.redis.rpush(self.keys[0], _entry(self.user.id, 'user', 'appended'))
+
+        history = load_window(self.user)
+
+        self.assertEqual([msg['content'] for msg in history], ['stored', 'appended'])
+        self.assertEqual(load_window(self.user), history)
+
+    def test_rebuild_does_not_duplicate_rows_already_in_the_window(self):
+        message = ChatMessage.objects.create(user=self.user, role='user', content='stored')
+        self.redis.rpush(self.keys[0], json.dumps({
+            'user_id': self.user.id, 'role': 'user', 'content': 'stored', 'timestamp': message.timestamp.isoformat(),
+        }))
+
+        self.assertEqual([msg['content'] for msg in load_window(self.user)], ['stored'])
@@ -1,6 +1,8 @@
 from django.urls import path
-from chatbot.views import ChatView
+from chatbot.views import ChatView, ChatStreamView, AnswerCacheStatsView
 
 urlpatterns = [
     path('message/', ChatView.as_view(), name='chat'),
+    path('message/stream/', ChatStreamView.as_view(), name='chat-stream'),
+    path('cache-stats/', AnswerCacheStatsView.as_view(), name='chat-cache-stats'),
 ]
\ No newline at end of file
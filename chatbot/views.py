@@ -1,16 +1,88 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework import status
 
-from chatbot.models import ChatMessage
-from services.chatbot_services import get_chatbot_response
+from chatbot.tasks import refresh_chat_summary
+from services.chat_answer_cache import answer_cache_stats
+from services.chat_context import aprepare_context, prepare_context
+from services.chat_history_service import aappend_turn, aload_window, load_window
+from services.chatbot_services import aget_chatbot_response, astream_chatbot_response
+from services.sse import STREAM_RENDERER_CLASSES, sse_event, sse_response
+from users.authentication import aauthenticate
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ChatView(View):
+    """
+    Async chat endpoint. A plain Django view because DRF views are sync-only;
+    it authenticates the Bearer JWT itself. Every wait — history, Groq, prices,
+    persistence — is awaited, so an in-flight conversation holds no thread.
+    In the common case the conversation window lives in Redis and the request
+    makes no Postgres round trip at all.
+    """
+
+    async def post(self, request):
+        user = await aauthenticate(request)
+        if user is None:
+            return JsonResponse(
+                {'detail': 'Authentication credentials were not provided.'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        try:
+            payload = json.loads(request.body or b'{}')
+        except json.JSONDecodeError:
+            payload = request.POST
+        if not isinstance(payload, dict):
+            return JsonResponse(
+                {'error': 'Request body must be a JSON object'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        user_message = str(payload.get('message', '')).strip()
+
+        if not user_message:
+            return JsonResponse(
+                {'error': 'Message cannot be empty'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
+        history = await aload_window(user)
+        # Recent turns within the token budget, older ones via the rolling summary
+        context = await aprepare_context(user.id, history)
+        if context.needs_refresh:
+            await sync_to_async(refresh_chat_summary.delay)(user.id)
 
-class ChatView(APIView):
+        # Call the chatbot function
+        result = await aget_chatbot_response(
+            user_message=user_message,
+            history=context.history,
+            summary=context.summary
+        )
+
+        # Into the Redis window now, into Postgres with the next flush_chat_messages batch
+        await aappend_turn(user, user_message, result['response'])
+
+        return JsonResponse({'response': result['response']})
+
+
+class ChatStreamView(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = STREAM_RENDERER_CLASSES
 
     def post(self, request):
+        """
+        POST /api/chatbot/message/stream/
+        Server-sent events: one `data: {"token": ...}` frame per chunk, then an
+        `event: done` frame carrying the full response.
+        """
         user_message = request.data.get('message', '').strip()
 
         if not user_message:
@@ -19,32 +91,33 @@ class ChatView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Load last 20 messages from DB and convert to history format
-        recent_messages = ChatMessage.objects.filter(
-            user=request.user
-        ).order_by('-timestamp')[:20]
+        user = request.user
+        context = prepare_context(user.id, load_window(user))
+        if context.needs_refresh:
+            refresh_chat_summary.delay(user.id)
 
-        history = [
-            {'role': msg.role, 'content': msg.content}
-            for msg in reversed(list(recent_messages))
-        ]
+        # Async so the ASGI server flushes each frame instead of buffering the body
+        async def events():
+            parts = []
+            try:
+                async for token in astream_chatbot_response(
+                    user_message=user_message, history=context.history, summary=context.summary
+                ):
+                    parts.append(token)
+                    yield sse_event({'token': token})
+                yield sse_event({'response': ''.join(parts)}, event='done')
+            finally:
+                # Store whatever was generated, even if the client hung up mid-stream
+                if parts:
+                    await aappend_turn(user, user_message, ''.join(parts))
 
-        # Call the chatbot function
-        result = get_chatbot_response(
-            user_message=user_message,
-            history=history
-        )
+        return sse_response(events())
 
-        # Save both messages to DB
-        ChatMessage.objects.create(
-            user=request.user,
-            role='user',
-            content=user_message
-        )
-        ChatMessage.objects.create(
-            user=request.user,
-            role='assistant',
-            content=result['response']
-        )
 
-        return Response({'response': result['response']})
\ No newline at end of file
+
+class AnswerCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """GET /api/chatbot/cache-stats/ — hit rate of the standalone-question answer cache."""
+        return Response(answer_cache_stats())
@@ -1,14 +1,19 @@
 import os
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-import market.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
+# Set up Django before the websocket stack imports any models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+import market.routing  # noqa: E402
+from users.middleware import JWTAuthMiddleware  # noqa: E402
+
 application = ProtocolTypeRouter({
-    'http': get_asgi_application(),
-    'websocket': AuthMiddlewareStack(
+    'http': django_asgi_app,
+    # JWT like the REST API, instead of channels' session-based AuthMiddlewareStack
+    'websocket': JWTAuthMiddleware(
         URLRouter(market.routing.websocket_urlpatterns)
     ),
-})
\ No newline at end of file
+})
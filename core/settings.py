@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'django_celery_beat',
     'channels',
@@ -101,7 +102,7 @@ SIMPLE_JWT = {
 # ── DRF — one definition, both keys present ───────────────────────────────────
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
@@ -116,6 +117,12 @@ CELERY_RESULT_BACKEND = REDIS_URL
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 CELERY_TIMEZONE = 'Asia/Kolkata'
 
+# ── Equity curve retention ────────────────────────────────────────────────────
+# 5-minute portfolio points older than this are compacted to one per day,
+# and daily points older than PORTFOLIO_DAILY_RETENTION_DAYS to one per week.
+PORTFOLIO_INTRADAY_RETENTION_DAYS = int(os.getenv('PORTFOLIO_INTRADAY_RETENTION_DAYS', 7))
+PORTFOLIO_DAILY_RETENTION_DAYS = int(os.getenv('PORTFOLIO_DAILY_RETENTION_DAYS', 180))
+
 # ── Django Channels ───────────────────────────────────────────────────────────
 CHANNEL_LAYERS = {
     'default': {
@@ -139,6 +146,14 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'market.tasks.warm_price_cache',
         'schedule': 20.0,
     },
+    'build-market-dashboard': {
+        'task': 'market.build_market_dashboard',
+        'schedule': 20.0,
+    },
+    'rebuild-market-aggregates': {
+        'task': 'market.rebuild_market_aggregates',
+        'schedule': 3600.0,
+    },
     'process-pending-orders': {
         'task': 'trading.tasks.process_pending_orders',
         'schedule': 60.0,
@@ -147,6 +162,14 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'trading.tasks.take_portfolio_snapshots',
         'schedule': crontab(hour=10, minute=5),
     },
+    'take-intraday-snapshots': {
+        'task': 'trading.tasks.take_intraday_snapshots',
+        'schedule': crontab(minute='*/5', hour='9-15', day_of_week='mon-fri'),
+    },
+    'compact-portfolio-points': {
+        'task': 'trading.tasks.compact_portfolio_points',
+        'schedule': crontab(hour=16, minute=30),
+    },
     'update-leaderboard': {
         'task': 'trading.tasks.update_leaderboard',
         'schedule': 1800.0,
@@ -155,6 +178,14 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'stories.tasks.rotate_daily_story',
         'schedule': crontab(hour=2, minute=30),  # 8 AM IST
     },
+    'flush-chat-messages': {
+        'task': 'chatbot.tasks.flush_chat_messages',
+        'schedule': 5.0,
+    },
+    'prune-chat-messages': {
+        'task': 'chatbot.tasks.prune_chat_messages',
+        'schedule': crontab(hour=3, minute=0),
+    },
 }
 
 CORS_ALLOWED_ORIGINS = [
@@ -1,3 +1,8 @@
 from django.contrib import admin
+from .models import Watchlist
 
-# Register your models here.
+
+@admin.register(Watchlist)
+class WatchlistAdmin(admin.ModelAdmin):
+    list_display = ('user', 'name', 'updated_at')
+    search_fields = ('user__username', 'name')
@@ -4,11 +4,12 @@ import logging
 
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from market.symbols import DEFAULT_WATCHLIST
 from services.price_service import get_multiple_prices
 
 logger = logging.getLogger(__name__)
 
-DEFAULT_SYMBOLS = ['RELIANCE', 'TCS', 'INFY', 'HDFCBANK', 'ICICIBANK']
+DEFAULT_SYMBOLS = list(DEFAULT_WATCHLIST)
 
 
 class PriceConsumer(AsyncWebsocketConsumer):
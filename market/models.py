@@ -1,3 +1,21 @@
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
 from django.db import models
 
-# Create your models here.
+MAX_WATCHLIST_SYMBOLS = 50
+
+
+class Watchlist(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='watchlists')
+    name = models.CharField(max_length=50)
+    # Stored inline, in display order, so a watchlist is one row read
+    symbols = ArrayField(models.CharField(max_length=20), default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'name')
+        ordering = ['created_at', 'id']
+
+    def __str__(self):
+        return f"{self.user} — {self.name}"
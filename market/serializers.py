@@ -0,0 +1,37 @@
+import re
+
+from rest_framework import serializers
+
+from .models import MAX_WATCHLIST_SYMBOLS, Watchlist
+
+SYMBOL_PATTERN = re.compile(r'^[A-Z0-9&\-]{1,20}$')
+
+
+def normalize_symbols(symbols) -> list:
+    """Upper-cased, de-duplicated (order kept), validated symbol list."""
+    cleaned = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+    invalid = [s for s in cleaned if not SYMBOL_PATTERN.match(s)]
+    if invalid:
+        raise serializers.ValidationError(f"Invalid symbols: {', '.join(invalid[:5])}")
+    if len(cleaned) > MAX_WATCHLIST_SYMBOLS:
+        raise serializers.ValidationError(f"At most {MAX_WATCHLIST_SYMBOLS} symbols allowed")
+    return cleaned
+
+
+class WatchlistSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Watchlist
+        fields = ['id', 'name', 'symbols', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+    def validate_symbols(self, value):
+        return normalize_symbols(value)
+
+    def validate_name(self, value):
+        user = self.context['request'].user
+        clash = Watchlist.objects.filter(user=user, name=value)
+        if self.instance is not None:
+            clash = clash.exclude(pk=self.instance.pk)
+        if clash.exists():
+            raise serializers.ValidationError('You already have a watchlist with this name')
+        return value
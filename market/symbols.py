@@ -0,0 +1,144 @@
+"""
+Central registry of the NSE symbols the app knows about: company name,
+sector and index membership with weights. Everything that used to carry its
+own copy-pasted list (price warming, the dashboard, the search fallback, the
+chatbot's ticker detection, the price websocket) reads from here.
+
+Index weights are approximate free-float weights from the NSE index
+factsheets; aggregates normalise over the constituents that have a quote,
+so they only need to be roughly right. Refresh them from the monthly
+factsheet when constituents change, then run
+market.rebuild_market_aggregates.
+"""
+from typing import NamedTuple
+
+
+class SymbolInfo(NamedTuple):
+    symbol: str
+    name: str
+    sector: str
+
+
+# symbol, company name, sector
+_REGISTRY = (
+    ("RELIANCE", "Reliance Industries Ltd", "Oil & Gas"),
+    ("ONGC", "Oil & Natural Gas Corporation Ltd", "Oil & Gas"),
+    ("BPCL", "Bharat Petroleum Corporation Ltd", "Oil & Gas"),
+    ("IOC", "Indian Oil Corporation Ltd", "Oil & Gas"),
+    ("COALINDIA", "Coal India Ltd", "Oil & Gas"),
+    ("HDFCBANK", "HDFC Bank Ltd", "Banks"),
+    ("ICICIBANK", "ICICI Bank Ltd", "Banks"),
+    ("SBIN", "State Bank of India", "Banks"),
+    ("KOTAKBANK", "Kotak Mahindra Bank Ltd", "Banks"),
+    ("AXISBANK", "Axis Bank Ltd", "Banks"),
+    ("INDUSINDBK", "IndusInd Bank Ltd", "Banks"),
+    ("BANKBARODA", "Bank of Baroda", "Banks"),
+    ("PNB", "Punjab National Bank", "Banks"),
+    ("CANBK", "Canara Bank", "Banks"),
+    ("FEDERALBNK", "The Federal Bank Ltd", "Banks"),
+    ("IDFCFIRSTB", "IDFC First Bank Ltd", "Banks"),
+    ("AUBANK", "AU Small Finance Bank Ltd", "Banks"),
+    ("BAJFINANCE", "Bajaj Finance Ltd", "Financial Services"),
+    ("BAJAJFINSV", "Bajaj Finserv Ltd", "Financial Services"),
+    ("HDFCLIFE", "HDFC Life Insurance Company Ltd", "Financial Services"),
+    ("SBILIFE", "SBI Life Insurance Company Ltd", "Financial Services"),
+    ("TCS", "Tata Consultancy Services Ltd", "IT"),
+    ("INFY", "Infosys Ltd", "IT"),
+    ("HCLTECH", "HCL Technologies Ltd", "IT"),
+    ("WIPRO", "Wipro Ltd", "IT"),
+    ("TECHM", "Tech Mahindra Ltd", "IT"),
+    ("LTIM", "LTIMindtree Ltd", "IT"),
+    ("PERSISTENT", "Persistent Systems Ltd", "IT"),
+    ("COFORGE", "Coforge Ltd", "IT"),
+    ("MPHASIS", "Mphasis Ltd", "IT"),
+    ("LTTS", "L&T Technology Services Ltd", "IT"),
+    ("HINDUNILVR", "Hindustan Unilever Ltd", "FMCG"),
+    ("ITC", "ITC Ltd", "FMCG"),
+    ("NESTLEIND", "Nestle India Ltd", "FMCG"),
+    ("BRITANNIA", "Britannia Industries Ltd", "FMCG"),
+    ("TATACONSUM", "Tata Consumer Products Ltd", "FMCG"),
+    ("MARUTI", "Maruti Suzuki India Ltd", "Automobile"),
+    ("TATAMOTORS", "Tata Motors Ltd", "Automobile"),
+    ("EICHERMOT", "Eicher Motors Ltd", "Automobile"),
+    ("HEROMOTOCO", "Hero MotoCorp Ltd", "Automobile"),
+    ("TATASTEEL", "Tata Steel Ltd", "Metals & Mining"),
+    ("JSWSTEEL", "JSW Steel Ltd", "Metals & Mining"),
+    ("HINDALCO", "Hindalco Industries Ltd", "Metals & Mining"),
+    ("VEDL", "Vedanta Ltd", "Metals & Mining"),
+    ("ADANIENT", "Adani Enterprises Ltd", "Metals & Mining"),
+    ("SUNPHARMA", "Sun Pharmaceutical Industries Ltd", "Healthcare"),
+    ("DRREDDY", "Dr. Reddy's Laboratories Ltd", "Healthcare"),
+    ("CIPLA", "Cipla Ltd", "Healthcare"),
+    ("DIVISLAB", "Divi's Laboratories Ltd", "Healthcare"),
+    ("APOLLOHOSP", "Apollo Hospitals Enterprise Ltd", "Healthcare"),
+    ("BHARTIARTL", "Bharti Airtel Ltd", "Telecom"),
+    ("LT", "Larsen & Toubro Ltd", "Construction"),
+    ("ADANIPORTS", "Adani Ports and Special Economic Zone Ltd", "Services"),
+    ("NTPC", "NTPC Ltd", "Power"),
+    ("POWERGRID", "Power Grid Corporation of India Ltd", "Power"),
+    ("ULTRACEMCO", "UltraTech Cement Ltd", "Construction Materials"),
+    ("SHREECEM", "Shree Cement Ltd", "Construction Materials"),
+    ("GRASIM", "Grasim Industries Ltd", "Construction Materials"),
+    ("TITAN", "Titan Company Ltd", "Consumer Durables"),
+    ("ASIANPAINT", "Asian Paints Ltd", "Consumer Durables"),
+    ("UPL", "UPL Ltd", "Chemicals"),
+)
+
+INDEX_WEIGHTS = {
+    "NIFTY50": {
+        "HDFCBANK": 13.0, "ICICIBANK": 9.0, "RELIANCE": 8.5, "INFY": 5.0,
+        "BHARTIARTL": 4.8, "LT": 3.9, "ITC": 3.4, "TCS": 3.0, "AXISBANK": 3.0,
+        "SBIN": 2.9, "KOTAKBANK": 2.8, "BAJFINANCE": 2.2, "HINDUNILVR": 1.9,
+        "SUNPHARMA": 1.6, "HCLTECH": 1.5, "MARUTI": 1.5, "NTPC": 1.4,
+        "TITAN": 1.2, "ULTRACEMCO": 1.2, "TATAMOTORS": 1.1, "POWERGRID": 1.1,
+        "TATASTEEL": 1.1, "ASIANPAINT": 0.9, "BAJAJFINSV": 0.9, "JSWSTEEL": 0.9,
+        "ADANIPORTS": 0.9, "TECHM": 0.9, "GRASIM": 0.9, "HINDALCO": 0.9,
+        "ONGC": 0.8, "COALINDIA": 0.7, "CIPLA": 0.7, "SBILIFE": 0.7,
+        "HDFCLIFE": 0.7, "EICHERMOT": 0.7, "NESTLEIND": 0.6, "DRREDDY": 0.6,
+        "WIPRO": 0.6, "TATACONSUM": 0.6, "APOLLOHOSP": 0.6, "ADANIENT": 0.6,
+        "BRITANNIA": 0.5, "HEROMOTOCO": 0.5, "BPCL": 0.5, "INDUSINDBK": 0.4,
+        "DIVISLAB": 0.4, "SHREECEM": 0.4, "UPL": 0.3, "IOC": 0.3, "VEDL": 0.3,
+    },
+    "NIFTYBANK": {
+        "HDFCBANK": 28.0, "ICICIBANK": 25.0, "SBIN": 9.0, "KOTAKBANK": 8.5,
+        "AXISBANK": 8.5, "INDUSINDBK": 3.0, "BANKBARODA": 3.0, "FEDERALBNK": 3.0,
+        "IDFCFIRSTB": 2.5, "PNB": 2.5, "AUBANK": 2.0, "CANBK": 2.0,
+    },
+    "NIFTYIT": {
+        "INFY": 28.0, "TCS": 23.0, "HCLTECH": 11.0, "TECHM": 10.0, "WIPRO": 7.0,
+        "LTIM": 6.0, "PERSISTENT": 5.0, "COFORGE": 4.5, "MPHASIS": 3.0, "LTTS": 2.5,
+    },
+}
+
+# What the price websocket streams before a client picks its own symbols
+DEFAULT_WATCHLIST = ("RELIANCE", "TCS", "INFY", "HDFCBANK", "ICICIBANK")
+
+SYMBOLS = {row[0]: SymbolInfo(*row) for row in _REGISTRY}
+SECTORS = {}
+for _info in SYMBOLS.values():
+    SECTORS.setdefault(_info.sector, []).append(_info.symbol)
+SECTORS = {sector: tuple(members) for sector, members in SECTORS.items()}
+
+# Constituents in descending weight order
+INDEX_MEMBERS = {
+    index: tuple(sorted(weights, key=weights.get, reverse=True))
+    for index, weights in INDEX_WEIGHTS.items()
+}
+
+# symbol -> ((kind, aggregate name, weight), ...): everything one quote feeds into.
+# Sectors are equal-weighted, indices use their constituent weights.
+MEMBERSHIPS = {
+    symbol: (("sector", info.sector, 1.0),) + tuple(
+        ("index", index, weights[symbol])
+        for index, weights in INDEX_WEIGHTS.items()
+        if symbol in weights
+    )
+    for symbol, info in SYMBOLS.items()
+}
+
+assert all(symbol in SYMBOLS for weights in INDEX_WEIGHTS.values() for symbol in weights), \
+    "Every index constituent needs a registry entry"
+
+
+def index_members(index: str) -> tuple:
+    return INDEX_MEMBERS[index]
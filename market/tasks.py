@@ -2,24 +2,14 @@ import logging
 
 from celery import shared_task
 
+from market.symbols import SYMBOLS
 from market.utils import is_market_open
-from services.price_service import get_multiple_prices
+from services.market_aggregates_service import rebuild_aggregates
+from services.market_dashboard_service import build_dashboard
+from services.price_service import get_quotes
 
 logger = logging.getLogger(__name__)
 
-TOP_NSE_STOCKS = [
-    'RELIANCE', 'TCS', 'HDFCBANK', 'INFY', 'ICICIBANK',
-    'HINDUNILVR', 'ITC', 'SBIN', 'BHARTIARTL', 'KOTAKBANK',
-    'LT', 'AXISBANK', 'ASIANPAINT', 'MARUTI', 'BAJFINANCE',
-    'HCLTECH', 'WIPRO', 'ULTRACEMCO', 'TITAN', 'SUNPHARMA',
-    'ONGC', 'POWERGRID', 'NTPC', 'TECHM', 'NESTLEIND',
-    'BAJAJFINSV', 'JSWSTEEL', 'TATAMOTORS', 'ADANIENT', 'ADANIPORTS',
-    'TATASTEEL', 'COALINDIA', 'DIVISLAB', 'DRREDDY', 'CIPLA',
-    'HDFCLIFE', 'SBILIFE', 'INDUSINDBK', 'GRASIM', 'BRITANNIA',
-    'EICHERMOT', 'HEROMOTOCO', 'APOLLOHOSP', 'TATACONSUM', 'BPCL',
-    'VEDL', 'IOC', 'SHREECEM', 'UPL', 'HINDALCO',
-]
-
 
 @shared_task(name='market.warm_price_cache')
 def warm_price_cache():
@@ -27,13 +17,25 @@ def warm_price_cache():
         logger.info('Market closed — skipping cache warm.')
         return {'skipped': True, 'reason': 'market_closed'}
 
-    success, failed = 0, 0
-    for symbol in TOP_NSE_STOCKS:
-        result = get_multiple_prices([symbol])
-        if result.get(symbol):
-            success += 1
-        else:
-            failed += 1
+    # Every registry symbol, so each sector and index aggregate keeps getting quotes.
+    # One batch download for all the misses instead of a round trip per symbol.
+    quotes = get_quotes(list(SYMBOLS))
+    success = sum(1 for symbol in SYMBOLS if quotes.get(symbol))
+    failed = len(SYMBOLS) - success
 
     logger.info(f'Cache warm complete — success: {success}, failed: {failed}')
-    return {'success': success, 'failed': failed}
\ No newline at end of file
+    return {'success': success, 'failed': failed}
+
+
+@shared_task(name='market.build_market_dashboard')
+def build_market_dashboard():
+    """Recompute the shared top-movers dashboard served by market.views.top_movers."""
+    result = build_dashboard()
+    logger.info(f"Market dashboard {'updated' if result['changed'] else 'unchanged'}")
+    return result
+
+
+@shared_task(name='market.rebuild_market_aggregates')
+def rebuild_market_aggregates():
+    """Recompute sector / index aggregates from scratch (drift and registry changes)."""
+    return {'aggregates': rebuild_aggregates()}
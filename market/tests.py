@@ -1,3 +1,107 @@
-from django.test import TestCase
+from unittest.mock import patch
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from services import history_service
+from services.history_service import bucket_ohlc, lttb_indices
+from users.models import User
+
+
+def _download(rows: int, start='2024-01-01'):
+    index = pd.date_range(start, periods=rows, freq='D', tz='UTC')
+    closes = np.linspace(100, 200, rows)
+    return pd.DataFrame({
+        'Open': closes, 'High': closes + 1, 'Low': closes - 1, 'Close': closes, 'Volume': 1000.0,
+    }, index=index)
+
+
+class DownsamplingTests(SimpleTestCase):
+
+    def test_lttb_keeps_the_ends_and_the_extremes(self):
+        t = list(range(1000))
+        c = [0.0] * 1000
+        c[400] = 50.0
+        c[700] = -50.0
+
+        selected = lttb_indices(t, c, 50)
+
+        self.assertEqual(len(selected), 50)
+        self.assertEqual((selected[0], selected[-1]), (0, 999))
+        self.assertIn(400, selected)
+        self.assertIn(700, selected)
+        self.assertEqual(selected, sorted(selected))
+
+    def test_lttb_returns_short_series_unchanged(self):
+        self.assertEqual(lttb_indices([1, 2, 3], [1.0, 2.0, 3.0], 20), [0, 1, 2])
+
+    def test_ohlc_buckets_aggregate_exactly(self):
+        bars = {
+            't': [0, 1, 2, 3], 'o': [10, 11, 12, 13], 'h': [15, 19, 14, 16],
+            'l': [9, 8, 11, 12], 'c': [11, 12, 13, 14], 'v': [1, 2, 3, 4],
+        }
+
+        self.assertEqual(bucket_ohlc(bars, 2), [[0, 10, 19, 8, 12, 3], [2, 12, 16, 11, 14, 7]])
+
+
+class DownloadBarsTests(SimpleTestCase):
+
+    def test_bars_with_missing_prices_are_dropped(self):
+        data = _download(4)
+        data.iloc[1, data.columns.get_loc('Open')] = np.nan
+        data.iloc[2, data.columns.get_loc('Low')] = np.nan
+        data.iloc[3, data.columns.get_loc('Volume')] = np.nan
+
+        with patch.object(history_service.yf, 'download', return_value=data):
+            bars = history_service._download_bars('TCS', '1mo')
+
+        self.assertEqual(bars['t'], [1704067200, 1704326400])
+        self.assertEqual(bars['v'], [1000, 0])
+
+    def test_failed_download_is_logged(self):
+        with patch.object(history_service.yf, 'download', side_effect=RuntimeError('rate limited')):
+            with self.assertLogs('services.history_service', level='WARNING'):
+                self.assertIsNone(history_service._download_bars('TCS', '1mo'))
+
+
+class PriceHistoryViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='price-history', password='pw12345!'))
+        self.keys = [history_service._bars_key('TCS', '1y')] + [
+            history_service._series_key('TCS', '1y', mode, points)
+            for mode in history_service.MODES for points in (20, 50)
+        ]
+        history_service.redis_client.delete(*self.keys)
+
+    def tearDown(self):
+        history_service.redis_client.delete(*self.keys)
+
+    def test_series_is_downsampled_and_revalidates_with_304(self):
+        with patch.object(history_service.yf, 'download', return_value=_download(250)) as download:
+            response = self.client.get('/api/market/history/TCS/', {'range': '1y', 'mode': 'line', 'points': 50})
+            body = response.json()
+            self.assertEqual(len(body['bars']), 50)
+            self.assertEqual(body['source_bars'], 250)
+
+            cached = self.client.get(
+                '/api/market/history/TCS/', {'range': '1y', 'mode': 'line', 'points': 50},
+                HTTP_IF_NONE_MATCH=response['ETag'],
+            )
+            self.assertEqual(cached.status_code, 304)
+
+            # Another resolution reuses the stored bars
+            candles = self.client.get('/api/market/history/TCS/', {'range': '1y', 'mode': 'ohlc', 'points': 20}).json()
+            self.assertEqual(len(candles['bars']), 20)
+
+        self.assertEqual(download.call_count, 1)
+
+    def test_unknown_range_is_rejected(self):
+        self.assertEqual(self.client.get('/api/market/history/TCS/', {'range': '2d'}).status_code, 400)
+
+    def test_missing_history_is_404(self):
+        with patch.object(history_service.yf, 'download', return_value=pd.DataFrame()):
+            self.assertEqual(self.client.get('/api/market/history/TCS/', {'range': '1y'}).status_code, 404)
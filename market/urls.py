@@ -5,4 +5,11 @@ urlpatterns = [
     path('price/<str:ticker>/', views.get_stock_price, name='stock-price'),
     path('search/', views.search_stocks_view, name='stock-search'),
     path('top-movers/', views.top_movers, name='top-movers'),
+    path('sectors/', views.sector_performance, name='sector-performance'),
+    path('indices/', views.index_performance, name='index-performance'),
+    path('prices/', views.bulk_prices, name='bulk-prices'),
+    path('history/<str:ticker>/', views.price_history, name='price-history'),
+    path('watchlists/', views.watchlists, name='watchlists'),
+    path('watchlists/<int:watchlist_id>/', views.watchlist_detail, name='watchlist-detail'),
+    path('watchlists/<int:watchlist_id>/quotes/', views.watchlist_quotes, name='watchlist-quotes'),
 ]
\ No newline at end of file
@@ -1,23 +1,32 @@
 import logging
 from typing import Dict
 
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from rest_framework import serializers, status
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from market.utils import get_market_status
-from services.price_service import get_multiple_prices, get_price, search_stocks
+from market.models import MAX_WATCHLIST_SYMBOLS, Watchlist
+from market.serializers import SYMBOL_PATTERN, WatchlistSerializer, normalize_symbols
+from market.symbols import SYMBOLS
+from services.history_service import (
+    DEFAULT_POINTS, MAX_POINTS, MIN_POINTS, MODES, RANGES, NoHistory, get_history,
+)
+from services.http_cache import not_modified, set_validators
+from services.market_aggregates_service import index_summaries, sector_summaries
+from services.market_dashboard_service import DASHBOARD_MAX_AGE, get_dashboard, try_build_dashboard
+from services.price_service import get_price, get_quotes, search_stocks
 
 logger = logging.getLogger(__name__)
 
-# 🔥 HARDCODED FALLBACKS for weekends/market closed (RELIANCE etc.)
+# Column order of the array-shaped quote rows returned by the bulk endpoints
+QUOTE_FIELDS = ('symbol', 'price', 'change', 'change_percent', 'volume', 'source')
+
+# 🔥 FALLBACKS for weekends/market closed, straight from the symbol registry
 COMMON_STOCKS: Dict[str, Dict] = {
-    'RELIANCE': {'ticker': 'RELIANCE', 'name': 'Reliance Industries Ltd'},
-    'TCS': {'ticker': 'TCS', 'name': 'Tata Consultancy Services'},
-    'INFY': {'ticker': 'INFY', 'name': 'Infosys Ltd'},
-    'HDFCBANK': {'ticker': 'HDFCBANK', 'name': 'HDFC Bank Ltd'},
-    'ICICIBANK': {'ticker': 'ICICIBANK', 'name': 'ICICI Bank Ltd'},
-    'SBIN': {'ticker': 'SBIN', 'name': 'State Bank of India'},
+    symbol: {'ticker': symbol, 'name': info.name} for symbol, info in SYMBOLS.items()
 }
 
 
@@ -106,53 +115,163 @@ def search_stocks_view(request):
 
 
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
+@authentication_classes([])
+@permission_classes([AllowAny])
 def top_movers(request):
-    """GET /api/market/top-movers/"""
-    WATCHLIST = [
-        'RELIANCE', 'TCS', 'HDFCBANK', 'INFY', 'ICICIBANK',
-        'SBIN', 'BHARTIARTL', 'ITC', 'KOTAKBANK', 'AXISBANK',
-        'LT', 'WIPRO', 'HCLTECH', 'MARUTI', 'BAJFINANCE',
-    ]
+    """
+    GET /api/market/top-movers/
+    The same for every user, so it is public and served straight from the
+    blob build_market_dashboard stores each tick: one Redis read, no
+    serialization, and cacheable by browsers and proxies for a few seconds.
+    """
+    try:
+        dashboard = get_dashboard()
+        if dashboard is None:
+            # Producer hasn't run (or stalled); one request builds it, the rest retry shortly
+            if not try_build_dashboard():
+                return Response(
+                    {'error': 'Top movers are being refreshed'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={'Retry-After': str(DASHBOARD_MAX_AGE)},
+                )
+            dashboard = get_dashboard()
+    except Exception as e:
+        logger.error(f"Top movers failed: {e}")
+        return Response({'error': 'Top movers unavailable'}, status=500)
+
+    cache_control = {'public': True, 'max_age': DASHBOARD_MAX_AGE}
+    unchanged = not_modified(request, dashboard['etag'], dashboard['generated_at'], **cache_control)
+    if unchanged is not None:
+        return unchanged
+
+    response = HttpResponse(dashboard['body'], content_type='application/json')
+    return set_validators(response, dashboard['etag'], dashboard['generated_at'], **cache_control)
 
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sector_performance(request):
+    """GET /api/market/sectors/ — equal-weighted change and breadth per sector."""
+    return Response({'results': sector_summaries()})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def index_performance(request):
+    """GET /api/market/indices/ — weighted change and breadth per NIFTY index."""
+    return Response({'results': index_summaries()})
+
+
+def _quote_table(symbols: list) -> dict:
+    """
+    Quotes as {"fields": [...], "quotes": [[...], ...], "missing": [...]}:
+    field names once, then one array per symbol instead of repeated keys.
+    """
+    quotes = get_quotes(symbols)
+    rows, missing = [], []
+    for symbol in symbols:
+        quote = quotes.get(symbol)
+        if quote:
+            rows.append([symbol] + [quote.get(field) for field in QUOTE_FIELDS[1:]])
+        else:
+            missing.append(symbol)
+    return {'fields': QUOTE_FIELDS, 'quotes': rows, 'missing': missing}
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def bulk_prices(request):
+    """GET /api/market/prices/?symbols=RELIANCE,TCS,INFY (up to MAX_WATCHLIST_SYMBOLS)"""
+    raw = request.query_params.get('symbols', '')
     try:
-        prices = get_multiple_prices(WATCHLIST)
-        valid = []
-
-        for ticker in WATCHLIST:
-            p = prices.get(ticker)
-
-            if p:
-                valid.append({
-                    "ticker": ticker,
-                    "price": p.get("price"),
-                    "change": p.get("change", 0),
-                    "change_percent": p.get("change_percent", 0),
-                    "source": p.get("source"),
-                    "cached": p.get("cached", False),
-                })
-            else:
-                valid.append({
-                    "ticker": ticker,
-                    "price": None,
-                    "change": 0,
-                    "change_percent": 0,
-                    "source": "unavailable",
-                    "cached": False,
-                })
+        symbols = normalize_symbols(raw.split(','))
+    except serializers.ValidationError as e:
+        return Response({'error': e.detail[0]}, status=400)
+    if not symbols:
+        return Response({'error': 'Query param `symbols` is required'}, status=400)
 
-        sorted_prices = sorted(
-            valid,
-            key=lambda x: x.get('change_percent', 0),
-            reverse=True
-        )
+    return Response(_quote_table(symbols))
 
-        return Response({
-            'gainers': sorted_prices[:5],
-            'losers': sorted_prices[-5:][::-1],
-            'market_status': get_market_status(),
-        })
 
-    except Exception as e:
-        logger.error(f"Top movers failed: {e}")
-        return Response({'error': 'Top movers unavailable'}, status=500)
\ No newline at end of file
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def watchlists(request):
+    """GET / POST /api/market/watchlists/"""
+    if request.method == 'POST':
+        serializer = WatchlistSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=request.user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    lists = Watchlist.objects.filter(user=request.user)
+    return Response(WatchlistSerializer(lists, many=True, context={'request': request}).data)
+
+
+@api_view(['GET', 'PATCH', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def watchlist_detail(request, watchlist_id):
+    """GET / PATCH / DELETE /api/market/watchlists/<id>/"""
+    watchlist = get_object_or_404(Watchlist, id=watchlist_id, user=request.user)
+
+    if request.method == 'DELETE':
+        watchlist.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    if request.method == 'PATCH':
+        serializer = WatchlistSerializer(watchlist, data=request.data, partial=True, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+    return Response(WatchlistSerializer(watchlist, context={'request': request}).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def watchlist_quotes(request, watchlist_id):
+    """GET /api/market/watchlists/<id>/quotes/ — every symbol of the list, in its order."""
+    symbols = (
+        Watchlist.objects.filter(id=watchlist_id, user=request.user)
+        .values_list('symbols', flat=True).first()
+    )
+    if symbols is None:
+        return Response({'error': 'Watchlist not found'}, status=404)
+
+    return Response(_quote_table(symbols[:MAX_WATCHLIST_SYMBOLS]))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def price_history(request, ticker):
+    """
+    GET /api/market/history/<ticker>/?range=1mo&mode=ohlc&points=300
+    OHLCV candles (mode=ohlc, bucketed) or a close line (mode=line, LTTB),
+    never more than `points` of them whatever the range.
+    """
+    clean_ticker = ticker.upper().strip()
+    range_ = request.query_params.get('range', '1mo')
+    mode = request.query_params.get('mode', 'ohlc')
+    if not SYMBOL_PATTERN.match(clean_ticker):
+        return Response({'error': 'Invalid ticker'}, status=400)
+    if range_ not in RANGES:
+        return Response({'error': f"range must be one of: {', '.join(RANGES)}"}, status=400)
+    if mode not in MODES:
+        return Response({'error': f"mode must be one of: {', '.join(MODES)}"}, status=400)
+    try:
+        points = int(request.query_params.get('points', DEFAULT_POINTS))
+    except ValueError:
+        return Response({'error': 'points must be an integer'}, status=400)
+    points = max(MIN_POINTS, min(points, MAX_POINTS))
+
+    try:
+        history = get_history(clean_ticker, range_, mode, points)
+    except NoHistory as e:
+        return Response({'error': str(e)}, status=404)
+
+    cache_control = {'private': True, 'max_age': RANGES[range_][2]}
+    unchanged = not_modified(request, history['etag'], history['last_modified'], **cache_control)
+    if unchanged is not None:
+        return unchanged
+
+    response = HttpResponse(history['body'], content_type='application/json')
+    return set_validators(response, history['etag'], history['last_modified'], **cache_control)
@@ -0,0 +1,99 @@
+import hashlib
+import re
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+async_redis_client = redis.asyncio.from_url(settings.REDIS_URL, decode_responses=True)
+
+ANSWER_TTL = 60 * 60 * 24
+STATS_KEY = "chat_answer:stats"
+
+# Words that change the phrasing of a question but not what is being asked.
+# Question words (what / why / how / when) are kept, they change the answer.
+STOPWORDS = frozenset({
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "am",
+    "do", "does", "did", "of", "for", "to", "in", "on", "at", "by",
+    "i", "me", "my", "you", "your", "we", "us", "it", "its",
+    "please", "pls", "plz", "kindly", "can", "could", "would", "will",
+    "tell", "explain", "hey", "hi", "hello", "finbot", "about", "meaning",
+    "mean", "means", "define", "definition", "actually", "exactly", "just",
+})
+_CONTRACTIONS = {"whats": "what", "hows": "how", "whys": "why", "whos": "who"}
+_PUNCTUATION = re.compile(r"[^\w\s]")
+# Words that point back into the conversation or at the user's own situation;
+# a question using any of them can't be answered the same way for everyone.
+CONTEXT_WORDS = frozenset({
+    "it", "its", "this", "that", "these", "those", "they", "them", "their",
+    "he", "she", "him", "his", "her", "one", "ones",
+    "i", "me", "my", "mine", "we", "us", "our", "ours",
+    "above", "earlier", "previous", "before", "again", "also", "else",
+    "same", "instead", "then", "more", "another", "other", "too",
+})
+QUESTION_WORDS = frozenset({"what", "why", "how", "when", "who", "which", "where"})
+
+
+def _words(message: str) -> list:
+    return [_CONTRACTIONS.get(w, w) for w in _PUNCTUATION.sub("", message.lower()).split()]
+
+
+def normalize_question(message: str) -> str:
+    """
+    Canonical form of a question for cache lookups: lower-case, punctuation
+    dropped, stopwords removed. "What is an IPO?" and "what's ipo" collapse
+    to the same string.
+    """
+    words = _words(message)
+    kept = [w for w in words if w not in STOPWORDS]
+    return " ".join(kept or words)
+
+
+def is_standalone_question(message: str) -> bool:
+    """
+    Whether `message` reads the same without the conversation around it:
+    no pronouns or follow-up references, and a topic of its own ("what is
+    an IPO?" is, "why?" and "is it a good buy?" are not).
+    """
+    words = _words(message)
+    if any(w in CONTEXT_WORDS for w in words):
+        return False
+    return any(w not in STOPWORDS and w not in QUESTION_WORDS for w in words)
+
+
+def answer_cache_key(message: str, namespace: str) -> str:
+    digest = hashlib.sha256(normalize_question(message).encode()).hexdigest()[:32]
+    return f"chat_answer:{namespace}:{digest}"
+
+
+def get_cached_answer(message: str, namespace: str) -> str | None:
+    answer = redis_client.get(answer_cache_key(message, namespace))
+    redis_client.hincrby(STATS_KEY, "hits" if answer else "misses", 1)
+    return answer
+
+
+def store_answer(message: str, namespace: str, answer: str) -> None:
+    redis_client.setex(answer_cache_key(message, namespace), ANSWER_TTL, answer)
+
+
+async def aget_cached_answer(message: str, namespace: str) -> str | None:
+    answer = await async_redis_client.get(answer_cache_key(message, namespace))
+    await async_redis_client.hincrby(STATS_KEY, "hits" if answer else "misses", 1)
+    return answer
+
+
+async def astore_answer(message: str, namespace: str, answer: str) -> None:
+    await async_redis_client.setex(answer_cache_key(message, namespace), ANSWER_TTL, answer)
+
+
+def answer_cache_stats() -> dict:
+    stats = redis_client.hgetall(STATS_KEY)
+    hits = int(stats.get("hits", 0))
+    misses = int(stats.get("misses", 0))
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / lookups, 3) if lookups else None,
+    }
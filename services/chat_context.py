@@ -0,0 +1,108 @@
+import json
+from typing import NamedTuple
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+from services.chat_history_service import WINDOW_SIZE
+
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+async_redis_client = redis.asyncio.from_url(settings.REDIS_URL, decode_responses=True)
+
+# Prompt tokens spent on verbatim history; whatever doesn't fit is covered by the summary
+HISTORY_TOKEN_BUDGET = 1500
+# The two oldest window entries are always left out of the packed history, so
+# they are folded into the summary before the next turn pushes them out of the window
+MAX_PACKED_MESSAGES = WINDOW_SIZE - 2
+# Role markers and separators Groq adds around every chat message
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_TTL = 60 * 60 * 24 * 7
+SUMMARY_LOCK_TTL = 60
+
+
+class ChatContext(NamedTuple):
+    history: list
+    summary: str | None
+    # True when older turns are missing from the summary and a refresh was claimed
+    needs_refresh: bool
+
+
+def _summary_key(user_id: int) -> str:
+    return f"chat:summary:{user_id}"
+
+
+def _summary_lock_key(user_id: int) -> str:
+    return f"chat:summary_lock:{user_id}"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def pack_history(history: list, budget: int = HISTORY_TOKEN_BUDGET) -> tuple:
+    """
+    Split history into (dropped, packed): `packed` is the longest run of
+    most recent messages that fits in `budget` tokens, `dropped` is
+    everything older. The run is contiguous and starts on a user turn, so
+    the model never sees an answer without its question.
+    """
+    used = 0
+    start = len(history)
+    for idx in range(len(history) - 1, -1, -1):
+        cost = estimate_tokens(history[idx]["content"]) + MESSAGE_OVERHEAD_TOKENS
+        if used + cost > budget or len(history) - idx > MAX_PACKED_MESSAGES:
+            break
+        used += cost
+        start = idx
+    while start < len(history) and history[start]["role"] != "user":
+        start += 1
+    return history[:start], history[start:]
+
+
+def unsummarized(dropped: list, summary: dict | None) -> list:
+    """The dropped messages newer than what the stored summary already covers."""
+    if not summary:
+        return dropped
+    through = parse_datetime(summary["through"])
+    return [msg for msg in dropped if parse_datetime(msg["timestamp"]) > through]
+
+
+def get_summary(user_id: int) -> dict | None:
+    cached = redis_client.get(_summary_key(user_id))
+    return json.loads(cached) if cached else None
+
+
+def store_summary(user_id: int, text: str, through: str) -> None:
+    redis_client.setex(_summary_key(user_id), SUMMARY_TTL, json.dumps({"text": text, "through": through}))
+
+
+def release_summary_refresh(user_id: int) -> None:
+    redis_client.delete(_summary_lock_key(user_id))
+
+
+def prepare_context(user_id: int, history: list) -> ChatContext:
+    """
+    Budget-packed history plus the user's rolling summary of older turns.
+    If some dropped turns are not in the summary yet, `needs_refresh` tells
+    the caller to queue chatbot.tasks.refresh_chat_summary; only one caller
+    per user gets it until the refresh finishes or the lock expires.
+    """
+    dropped, packed = pack_history(history)
+    summary = get_summary(user_id)
+    needs_refresh = bool(unsummarized(dropped, summary)) and bool(
+        redis_client.set(_summary_lock_key(user_id), 1, nx=True, ex=SUMMARY_LOCK_TTL)
+    )
+    return ChatContext(packed, summary["text"] if summary else None, needs_refresh)
+
+
+async def aprepare_context(user_id: int, history: list) -> ChatContext:
+    dropped, packed = pack_history(history)
+    cached = await async_redis_client.get(_summary_key(user_id))
+    summary = json.loads(cached) if cached else None
+    needs_refresh = bool(unsummarized(dropped, summary)) and bool(
+        await async_redis_client.set(_summary_lock_key(user_id), 1, nx=True, ex=SUMMARY_LOCK_TTL)
+    )
+    return ChatContext(packed, summary["text"] if summary else None, needs_refresh)
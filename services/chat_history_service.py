@@ -0,0 +1,220 @@
+import json
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from chatbot.models import ChatMessage
+
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+async_redis_client = redis.asyncio.from_url(settings.REDIS_URL, decode_responses=True)
+
+WINDOW_SIZE = 20
+WINDOW_TTL = 60 * 60 * 24
+# Messages waiting to be written to Postgres by chatbot.tasks.flush_chat_messages.
+# A batch is moved to PROCESSING_KEY while it is written and only dropped once
+# committed, so a worker that dies mid-flush leaves it to be retried. Entries
+# that can't be stored end up in DEAD_KEY for inspection. None of these keys
+# carry a TTL: run Redis with a volatile-* maxmemory-policy (not allkeys-*),
+# or memory pressure can evict queued messages.
+PENDING_KEY = "chat:pending"
+PROCESSING_KEY = "chat:pending:processing"
+DEAD_KEY = "chat:pending:dead"
+FLUSH_LOCK_KEY = "chat:pending:flush_lock"
+FLUSH_ATTEMPTS_KEY = "chat:pending:attempts"
+
+# Resume an unacknowledged batch if there is one, otherwise move the next
+# ARGV[1] entries from the pending queue to the processing list.
+_CLAIM_SCRIPT = redis_client.register_script("""
+local processing = redis.call('LRANGE', KEYS[2], 0, -1)
+if #processing > 0 then return processing end
+local batch = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #batch == 0 then return batch end
+redis.call('LTRIM', KEYS[1], #batch, -1)
+redis.call('RPUSH', KEYS[2], unpack(batch))
+return batch
+""")
+
+
+# Install a window rebuilt from Postgres unless another request already did.
+# Turns appended while the rebuild was reading Postgres are not in its rows;
+# they are kept after them (entries equal to a Postgres row are dropped).
+# KEYS: window, loaded flag. ARGV: ttl, window size, Postgres rows oldest first.
+_WARM_SCRIPT_SOURCE = """
+if redis.call('EXISTS', KEYS[2]) == 1 then return redis.call('LRANGE', KEYS[1], 0, -1) end
+local appended = redis.call('LRANGE', KEYS[1], 0, -1)
+redis.call('DEL', KEYS[1])
+local stored = {}
+for i = 3, #ARGV do
+    stored[ARGV[i]] = true
+    redis.call('RPUSH', KEYS[1], ARGV[i])
+end
+for _, entry in ipairs(appended) do
+    if not stored[entry] then redis.call('RPUSH', KEYS[1], entry) end
+end
+redis.call('LTRIM', KEYS[1], -tonumber(ARGV[2]), -1)
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('SET', KEYS[2], 1, 'EX', ARGV[1])
+return redis.call('LRANGE', KEYS[1], 0, -1)
+"""
+_WARM_SCRIPT = redis_client.register_script(_WARM_SCRIPT_SOURCE)
+_AWARM_SCRIPT = async_redis_client.register_script(_WARM_SCRIPT_SOURCE)
+
+
+def _window_key(user_id: int) -> str:
+    return f"chat:window:{user_id}"
+
+
+def _loaded_key(user_id: int) -> str:
+    # Lists can't exist empty in Redis, so a separate flag says "this user's
+    # window was loaded, it is just empty" and spares new users a DB query
+    return f"chat:window_loaded:{user_id}"
+
+
+def _entry(user_id: int, role: str, content: str) -> str:
+    return json.dumps({
+        "user_id": user_id,
+        "role": role,
+        "content": content,
+        "timestamp": timezone.now().isoformat(),
+    })
+
+
+def _as_history(raw_entries: list) -> list:
+    return [
+        {"role": entry["role"], "content": entry["content"], "timestamp": entry["timestamp"]}
+        for entry in map(json.loads, raw_entries)
+    ]
+
+
+def _warm_args(user_id: int, messages: list) -> dict:
+    return {
+        'keys': [_window_key(user_id), _loaded_key(user_id)],
+        'args': [WINDOW_TTL, WINDOW_SIZE, *[
+            json.dumps({
+                "user_id": user_id,
+                "role": msg.role,
+                "content": msg.content,
+                "timestamp": msg.timestamp.isoformat(),
+            })
+            for msg in messages
+        ]],
+    }
+
+
+def load_window(user) -> list:
+    """
+    The user's last WINDOW_SIZE messages in history format (plus an ISO
+    `timestamp`), oldest first.
+    Served from Redis; Postgres is only read to rebuild an expired window.
+    """
+    pipeline = redis_client.pipeline()
+    pipeline.exists(_loaded_key(user.id))
+    pipeline.lrange(_window_key(user.id), 0, -1)
+    loaded, raw_entries = pipeline.execute()
+    if loaded:
+        return _as_history(raw_entries)
+
+    messages = list(ChatMessage.objects.filter(user=user).order_by('-timestamp')[:WINDOW_SIZE])[::-1]
+    return _as_history(_WARM_SCRIPT(**_warm_args(user.id, messages), client=redis_client))
+
+
+async def aload_window(user) -> list:
+    async with async_redis_client.pipeline() as pipeline:
+        pipeline.exists(_loaded_key(user.id))
+        pipeline.lrange(_window_key(user.id), 0, -1)
+        loaded, raw_entries = await pipeline.execute()
+    if loaded:
+        return _as_history(raw_entries)
+
+    messages = [
+        msg async for msg in ChatMessage.objects.filter(user=user).order_by('-timestamp')[:WINDOW_SIZE]
+    ][::-1]
+    return _as_history(await _AWARM_SCRIPT(**_warm_args(user.id, messages), client=async_redis_client))
+
+
+def cached_window(user_id: int) -> list | None:
+    """The window as currently held in Redis, or None if it has expired. Never reads Postgres."""
+    pipeline = redis_client.pipeline()
+    pipeline.exists(_loaded_key(user_id))
+    pipeline.lrange(_window_key(user_id), 0, -1)
+    loaded, raw_entries = pipeline.execute()
+    return _as_history(raw_entries) if loaded else None
+
+
+def _append_pipeline(pipeline, user_id: int, user_message: str, response: str):
+    entries = [_entry(user_id, 'user', user_message), _entry(user_id, 'assistant', response)]
+    key = _window_key(user_id)
+    pipeline.rpush(key, *entries)
+    pipeline.ltrim(key, -WINDOW_SIZE, -1)
+    pipeline.expire(key, WINDOW_TTL)
+    pipeline.expire(_loaded_key(user_id), WINDOW_TTL)
+    pipeline.rpush(PENDING_KEY, *entries)
+
+
+def append_turn(user, user_message: str, response: str) -> None:
+    """Record a question/answer pair in the window and queue it for Postgres."""
+    pipeline = redis_client.pipeline(transaction=True)
+    _append_pipeline(pipeline, user.id, user_message, response)
+    pipeline.execute()
+
+
+async def aappend_turn(user, user_message: str, response: str) -> None:
+    async with async_redis_client.pipeline(transaction=True) as pipeline:
+        _append_pipeline(pipeline, user.id, user_message, response)
+        await pipeline.execute()
+
+
+def acquire_flush_lock(ttl: int) -> bool:
+    """Only one flusher at a time may own the processing list."""
+    return bool(redis_client.set(FLUSH_LOCK_KEY, 1, nx=True, ex=ttl))
+
+
+def release_flush_lock() -> None:
+    redis_client.delete(FLUSH_LOCK_KEY)
+
+
+def claim_pending(batch_size: int) -> list:
+    """
+    The batch to write next: a batch left unacknowledged by an earlier
+    flush if there is one, otherwise up to batch_size entries moved from the
+    front of the queue to the processing list in one atomic step.
+    """
+    return _CLAIM_SCRIPT(keys=[PENDING_KEY, PROCESSING_KEY], args=[batch_size])
+
+
+def ack_pending() -> None:
+    """Drop the processing batch once it is committed to Postgres."""
+    pipeline = redis_client.pipeline(transaction=True)
+    pipeline.delete(PROCESSING_KEY)
+    pipeline.delete(FLUSH_ATTEMPTS_KEY)
+    pipeline.execute()
+
+
+def record_flush_failure() -> int:
+    """Count a failed attempt at the processing batch; returns the attempts so far."""
+    return redis_client.incr(FLUSH_ATTEMPTS_KEY)
+
+
+def dead_letter(raw_entries: list) -> None:
+    if raw_entries:
+        redis_client.rpush(DEAD_KEY, *raw_entries)
+
+
+def pending_to_messages(raw_entries: list) -> tuple:
+    """Parse queued entries into unsaved ChatMessages. Returns (messages, unparseable raw entries)."""
+    messages, bad = [], []
+    for raw in raw_entries:
+        try:
+            entry = json.loads(raw)
+            messages.append(ChatMessage(
+                user_id=entry["user_id"],
+                role=entry["role"],
+                content=entry["content"],
+                timestamp=parse_datetime(entry["timestamp"]),
+            ))
+        except (ValueError, TypeError, KeyError):
+            bad.append(raw)
+    return messages, bad
@@ -1,12 +1,23 @@
+import csv
+import logging
+from collections import defaultdict, deque
+import numpy as np
 import pandas as pd
 import yfinance as yf
 import ta
-from datetime import timedelta
+from asgiref.sync import sync_to_async
+from datetime import datetime, timedelta
+from decimal import Decimal
 from django.contrib.auth import get_user_model
-from trading.models import Transaction
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction as db_transaction
+from django.db.models import Max, Q
+from trading.models import EnrichedTrade, PortfolioSnapshot, TradeMatcherState, Transaction
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
 
 def _get_time_of_day_bucket(hour: int) -> str:
     """Categorize trade time into morning / afternoon / late."""
@@ -18,168 +29,334 @@ def _get_time_of_day_bucket(hour: int) -> str:
         return 'late'
 
 
-def _get_trend(closes: pd.Series) -> str:
+MARKET_STATE_COLUMNS = [
+    'trend',
+    'volatility',
+    'volume_level',
+    'distance_from_ma',
+    'rsi_value',
+    'distance_from_recent_high',
+    'distance_from_recent_low',
+]
+
+# Indicators need up to 20 bars of warm-up before the first trade, and an
+# as-of match is only trusted if the bar is no older than the old 60-day window.
+LOOKBACK_DAYS = 60
+MIN_BARS = 5
+# Failed enrichments are retried on later syncs until this many attempts; a
+# ticker with no history by then (delisted, renamed) is left without state
+MAX_MARKET_STATE_ATTEMPTS = 5
+
+
+def _get_trend(closes: pd.Series, ma_20: pd.Series) -> pd.Series:
     """Simple trend detection using 20-day MA."""
-    if len(closes) < 20:
-        return 'SIDEWAYS'
-    ma = closes.rolling(20).mean().iloc[-1]
-    current = closes.iloc[-1]
-    if current > ma * 1.02:
-        return 'UP'
-    elif current < ma * 0.98:
-        return 'DOWN'
-    return 'SIDEWAYS'
+    trend = pd.Series('SIDEWAYS', index=closes.index)
+    trend[closes > ma_20 * 1.02] = 'UP'
+    trend[closes < ma_20 * 0.98] = 'DOWN'
+    return trend
 
 
-def _get_volatility(closes: pd.Series) -> str:
-    """High volatility if std dev of last 10 days is above threshold."""
-    if len(closes) < 10:
-        return 'LOW'
-    std = closes.pct_change().rolling(10).std().iloc[-1]
-    return 'HIGH' if std > 0.02 else 'LOW'
+def _get_volatility(closes: pd.Series) -> pd.Series:
+    """High volatility if std dev of the last 10 daily returns is above threshold."""
+    std = closes.pct_change().rolling(10).std()
+    return pd.Series(np.where(std > 0.02, 'HIGH', 'LOW'), index=closes.index)
 
 
-def _get_volume_level(volumes: pd.Series) -> str:
-    """Compare latest volume to 20-day average."""
-    if len(volumes) < 20:
-        return 'LOW'
-    avg_volume = volumes.rolling(20).mean().iloc[-1]
-    current = volumes.iloc[-1]
-    return 'HIGH' if current > avg_volume * 1.2 else 'LOW'
+def _get_volume_level(volumes: pd.Series) -> pd.Series:
+    """Compare each day's volume to its 20-day average."""
+    avg_volume = volumes.rolling(20).mean()
+    return pd.Series(np.where(volumes > avg_volume * 1.2, 'HIGH', 'LOW'), index=volumes.index)
 
 
-def _fetch_market_state(ticker: str, trade_date) -> dict:
+def _compute_market_features(data: pd.DataFrame) -> pd.DataFrame:
     """
-    Fetch historical data from yfinance for a ticker around a trade date.
-    Computes all market state columns needed by the ML model.
+    Compute every market state column for every bar of a price history at once.
+    Each row holds the state as it looked at that day's close.
     """
+    closes = data['Close']
+    volumes = data['Volume']
+
+    ma_20 = closes.rolling(20).mean()
+    recent_high = data['High'].rolling(20).max()
+    recent_low = data['Low'].rolling(20).min()
+
+    features = pd.DataFrame({
+        'trend': _get_trend(closes, ma_20),
+        'volatility': _get_volatility(closes),
+        'volume_level': _get_volume_level(volumes),
+        'distance_from_ma': ((closes - ma_20) / ma_20).round(4),
+        'rsi_value': ta.momentum.RSIIndicator(closes, window=14).rsi().round(2),
+        'distance_from_recent_high': ((closes - recent_high) / recent_high).round(4),
+        'distance_from_recent_low': ((closes - recent_low) / recent_low).round(4),
+        'bars_seen': np.arange(1, len(closes) + 1),
+    }, index=closes.index)
+
+    features.index = pd.to_datetime(features.index).tz_localize(None).normalize().astype('datetime64[ns]')
+    features.index.name = 'market_date'
+    return features.reset_index()
+
+
+def _fetch_history(ticker: str, first_date, last_date) -> pd.DataFrame:
+    """One yfinance download covering every trade of a ticker, plus indicator warm-up."""
     try:
-        start = trade_date - timedelta(days=60)
-        end = trade_date + timedelta(days=1)
-
         data = yf.download(
             f"{ticker}.NS",
-            start=start,
-            end=end,
-            progress=False
+            start=first_date - timedelta(days=LOOKBACK_DAYS),
+            end=last_date + timedelta(days=1),
+            progress=False,
         )
-
-        if data.empty or len(data) < 5:
-            return {}
-
-        closes = data['Close']
-        volumes = data['Volume']
-        highs = data['High']
-        lows = data['Low']
-
-        # RSI using ta library — one line
-        rsi_series = ta.momentum.RSIIndicator(closes, window=14).rsi()
-        rsi_value = round(float(rsi_series.iloc[-1]), 2) if not rsi_series.empty else None
-
-        # Moving average distance
-        ma_20 = closes.rolling(20).mean().iloc[-1]
-        current_price = closes.iloc[-1]
-        distance_from_ma = round(float((current_price - ma_20) / ma_20), 4) if ma_20 else None
-
-        # Distance from recent high and low (last 20 days)
-        recent_high = highs.rolling(20).max().iloc[-1]
-        recent_low = lows.rolling(20).min().iloc[-1]
-        distance_from_high = round(float((current_price - recent_high) / recent_high), 4) if recent_high else None
-        distance_from_low = round(float((current_price - recent_low) / recent_low), 4) if recent_low else None
-
-        return {
-            'trend': _get_trend(closes),
-            'volatility': _get_volatility(closes),
-            'volume_level': _get_volume_level(volumes),
-            'distance_from_ma': distance_from_ma,
-            'rsi_value': rsi_value,
-            'distance_from_recent_high': distance_from_high,
-            'distance_from_recent_low': distance_from_low,
-        }
-
     except Exception as e:
-        print(f"Market state fetch failed for {ticker} on {trade_date}: {e}")
-        return {}
+        logger.warning(f"Market history fetch failed for {ticker}: {e}")
+        return pd.DataFrame()
+
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+    return data
 
 
-def _match_trades(transactions: list) -> list:
+def _enrich_with_market_state(trades: pd.DataFrame) -> pd.DataFrame:
     """
-    Match BUY transactions to SELL transactions for the same ticker.
-    Uses FIFO matching — first buy matched to first sell.
-    Returns a list of completed trade dicts.
+    Attach market state to completed trades, one history download per ticker.
+    Each trade gets the indicators of the last bar on or before its entry date.
+    Trades whose history could not be fetched or computed are flagged
+    market_state_pending and their market_state_attempts counted, until
+    MAX_MARKET_STATE_ATTEMPTS; too little history is final and is not flagged.
     """
-    from collections import defaultdict
-    buys = defaultdict(list)
-    completed_trades = []
-    trade_id = 1
+    trades['market_state_pending'] = False
+    trades['entry_date'] = pd.to_datetime(
+        trades['entry_time'].map(lambda t: t.date())
+    ).astype('datetime64[ns]')
 
-    for txn in transactions:
-        if txn.action == 'BUY':
-            buys[txn.ticker].append(txn)
+    enriched = []
+    for ticker, group in trades.groupby('ticker', sort=False):
+        group = group.sort_values('entry_date')
+        history = _fetch_history(
+            ticker,
+            group['entry_date'].min().date(),
+            group['entry_date'].max().date(),
+        )
+
+        if history.empty:
+            enriched.append(group.assign(market_state_pending=True))
+            continue
+        if len(history) < MIN_BARS:
+            enriched.append(group)
+            continue
+
+        try:
+            features = _compute_market_features(history)
+        except Exception as e:
+            logger.warning(f"Market state computation failed for {ticker}: {e}")
+            enriched.append(group.assign(market_state_pending=True))
+            continue
+
+        merged = pd.merge_asof(
+            group,
+            features,
+            left_on='entry_date',
+            right_on='market_date',
+            direction='backward',
+            tolerance=pd.Timedelta(days=LOOKBACK_DAYS),
+        )
+        # Mirror the old per-trade rule: no state without at least MIN_BARS of history
+        thin = merged['bars_seen'].isna() | (merged['bars_seen'] < MIN_BARS)
+        merged.loc[thin, MARKET_STATE_COLUMNS] = None
+        enriched.append(merged.drop(columns=['market_date', 'bars_seen']))
+
+    df = pd.concat(enriched, ignore_index=True)
+    df['market_state_attempts'] = df.get('market_state_attempts', 0) + df['market_state_pending'].astype(int)
+    exhausted = df['market_state_pending'] & (df['market_state_attempts'] >= MAX_MARKET_STATE_ATTEMPTS)
+    if exhausted.any():
+        logger.warning(
+            f"Giving up on market state for {int(exhausted.sum())} trades "
+            f"({', '.join(df.loc[exhausted, 'ticker'].unique())}) after {MAX_MARKET_STATE_ATTEMPTS} attempts"
+        )
+        df.loc[exhausted, 'market_state_pending'] = False
+    return df.sort_values('trade_id').drop(columns=['entry_date']).reset_index(drop=True)
 
-        elif txn.action == 'SELL' and buys[txn.ticker]:
-            buy_txn = buys[txn.ticker].pop(0)  # FIFO
 
-            entry_time = buy_txn.timestamp
-            exit_time = txn.timestamp
-            holding_seconds = (exit_time - entry_time).total_seconds()
-            holding_hours = round(holding_seconds / 3600, 2)
+EXPORT_CHUNK_SIZE = 2000
+MATCH_FIELDS = ('id', 'ticker', 'action', 'quantity', 'price_at_execution', 'timestamp')
+ENRICHED_TRADE_FIELDS = [
+    field.name for field in EnrichedTrade._meta.fields if field.name not in ('id', 'user')
+]
+MARKET_STATE_BOOKKEEPING = ['market_state_pending', 'market_state_attempts']
+# What the insights engine sees: the stored trade minus bookkeeping
+TRADE_DATAFRAME_FIELDS = [field for field in ENRICHED_TRADE_FIELDS if field not in MARKET_STATE_BOOKKEEPING]
 
-            position_size = float(buy_txn.price_at_execution * buy_txn.quantity)
-            pnl = float(txn.pnl) if txn.pnl else 0
+
+def _match_trades(transactions, lots: dict = None, trade_id: int = 1):
+    """
+    Match BUY lots to SELL transactions for the same ticker, FIFO.
+    Each ticker keeps a deque of open [remaining_qty, price, entry_time] lots;
+    a SELL consumes lots from the left and splits the last one on a partial
+    fill, yielding one completed trade per (lot, sell) slice.
+
+    `transactions` must be ordered by timestamp and is consumed lazily, so a
+    DB cursor can be passed straight in. Pass `lots` to resume from earlier
+    open positions — it is updated in place.
+    """
+    if lots is None:
+        lots = defaultdict(deque)
+
+    for txn in transactions:
+        if txn.action == 'BUY':
+            lots[txn.ticker].append([txn.quantity, txn.price_at_execution, txn.timestamp])
+            continue
+
+        if txn.action != 'SELL':
+            continue
+
+        open_lots = lots[txn.ticker]
+        remaining = txn.quantity
+        exit_price = float(txn.price_at_execution)
+        exit_time = txn.timestamp
+
+        while remaining and open_lots:
+            lot = open_lots[0]
+            lot_qty, lot_price, entry_time = lot
+            filled = min(lot_qty, remaining)
+
+            if filled == lot_qty:
+                open_lots.popleft()
+            else:
+                lot[0] = lot_qty - filled
+            remaining -= filled
+
+            entry_price = float(lot_price)
+            position_size = entry_price * filled
+            pnl = round((exit_price - entry_price) * filled, 2)
             pnl_pct = round((pnl / position_size) * 100, 2) if position_size else 0
 
-            completed_trades.append({
+            yield {
                 'trade_id': trade_id,
+                'sell_transaction_id': txn.id,
                 'ticker': txn.ticker,
                 'direction': 'LONG',  # paper trading only supports LONG for now
                 'entry_time': entry_time,
                 'exit_time': exit_time,
-                'entry_price': float(buy_txn.price_at_execution),
-                'exit_price': float(txn.price_at_execution),
-                'quantity': txn.quantity,
+                'entry_price': entry_price,
+                'exit_price': exit_price,
+                'quantity': filled,
                 'position_size': position_size,
-                'holding_time': holding_hours,
+                'holding_time': round((exit_time - entry_time).total_seconds() / 3600, 2),
                 'time_of_day_bucket': _get_time_of_day_bucket(entry_time.hour),
                 'day_of_week': entry_time.strftime('%A'),
                 'pnl': pnl,
                 'pnl_pct': pnl_pct,
-            })
+            }
             trade_id += 1
 
-    return completed_trades
 
+def _dump_lots(lots: dict) -> dict:
+    return {
+        ticker: [[qty, str(price), entry_time.isoformat()] for qty, price, entry_time in open_lots]
+        for ticker, open_lots in lots.items()
+        if open_lots
+    }
 
-def build_trade_dataframe(user) -> pd.DataFrame:
+
+def _load_lots(raw: dict) -> dict:
+    lots = defaultdict(deque)
+    for ticker, open_lots in raw.items():
+        lots[ticker].extend(
+            [qty, Decimal(price), datetime.fromisoformat(entry_time)]
+            for qty, price, entry_time in open_lots
+        )
+    return lots
+
+
+def _as_records(enriched: pd.DataFrame) -> list:
+    return enriched.astype(object).where(enriched.notna(), None).to_dict('records')
+
+
+def _retry_pending_market_state(user) -> int:
     """
-    Main function. Builds the complete DataFrame for a user's trades.
-    Fetches all their transactions, matches buys to sells,
-    enriches each completed trade with market state data from yfinance.
-    Returns a pandas DataFrame ready to pass to the ML function.
+    Re-enrich trades whose market history fetch failed on an earlier sync.
+    Every retried row is written back, so failed ones count the attempt.
+    Returns the number of rows that now have their market state.
     """
-    transactions = list(
-        Transaction.objects.filter(user=user).order_by('timestamp')
+    pending = pd.DataFrame.from_records(list(
+        EnrichedTrade.objects.filter(user=user, market_state_pending=True)
+        .values('id', 'trade_id', 'ticker', 'entry_time', 'market_state_attempts')
+    ))
+    if pending.empty:
+        return 0
+
+    records = _as_records(_enrich_with_market_state(pending))
+    fields = [*MARKET_STATE_BOOKKEEPING, *MARKET_STATE_COLUMNS]
+    EnrichedTrade.objects.bulk_update(
+        [EnrichedTrade(id=record['id'], **{field: record.get(field) for field in fields}) for record in records],
+        fields,
+        batch_size=EXPORT_CHUNK_SIZE,
+    )
+    return sum(
+        1 for record in records
+        if not record['market_state_pending'] and record['market_state_attempts'] < MAX_MARKET_STATE_ATTEMPTS
     )
 
-    if not transactions:
-        return pd.DataFrame()
 
-    completed_trades = _match_trades(transactions)
+def sync_enriched_trades(user) -> int:
+    """
+    Bring a user's EnrichedTrade rows up to date.
+    Only transactions newer than the last processed one are matched, resuming
+    from the open lots saved in TradeMatcherState, and only the trades they
+    complete are enriched and stored. Matching and the market history
+    downloads run outside any transaction; the state row is only locked to
+    persist, and the work is dropped if another sync got there first.
+    Returns the number of new trades.
+    """
+    _retry_pending_market_state(user)
+
+    state, _ = TradeMatcherState.objects.get_or_create(user=user)
+    latest_id = Transaction.objects.filter(user=user).aggregate(Max('id'))['id__max'] or 0
+    if latest_id <= state.last_transaction_id:
+        return 0
+
+    lots = _load_lots(state.open_lots)
+    transactions = (
+        Transaction.objects.filter(user=user, id__gt=state.last_transaction_id, id__lte=latest_id)
+        .order_by('timestamp', 'id')
+        .values_list(*MATCH_FIELDS, named=True)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    new_trades = pd.DataFrame.from_records(
+        _match_trades(transactions, lots, state.next_trade_id)
+    )
+    records = [] if new_trades.empty else _as_records(_enrich_with_market_state(new_trades))
+
+    with db_transaction.atomic():
+        locked = TradeMatcherState.objects.select_for_update().get(pk=state.pk)
+        if locked.last_transaction_id != state.last_transaction_id:
+            return 0
+
+        EnrichedTrade.objects.bulk_create(
+            [
+                EnrichedTrade(user=user, **{field: record.get(field) for field in ENRICHED_TRADE_FIELDS})
+                for record in records
+            ],
+            batch_size=EXPORT_CHUNK_SIZE,
+        )
+        if records:
+            locked.next_trade_id = int(new_trades['trade_id'].max()) + 1
+        locked.last_transaction_id = latest_id
+        locked.open_lots = _dump_lots(lots)
+        locked.save()
+
+    return len(records)
 
-    if not completed_trades:
-        return pd.DataFrame()
 
-    # Enrich each trade with market state
-    enriched = []
-    for trade in completed_trades:
-        market_state = _fetch_market_state(
-            trade['ticker'],
-            trade['entry_time'].date()
-        )
-        enriched.append({**trade, **market_state})
+def build_trade_dataframe(user) -> pd.DataFrame:
+    """
+    Main function. Builds the complete DataFrame for a user's trades.
+    Matches and enriches any trades completed since the last call, then
+    loads every stored enriched trade in one query.
+    Returns a pandas DataFrame ready to pass to the ML function.
+    """
+    sync_enriched_trades(user)
 
-    df = pd.DataFrame(enriched)
-    return df
+    rows = EnrichedTrade.objects.filter(user=user).order_by('trade_id').values(*TRADE_DATAFRAME_FIELDS)
+    return pd.DataFrame.from_records(list(rows))
 
 
 def export_trades_to_csv(user, filepath: str = None) -> str:
@@ -196,4 +373,80 @@ def export_trades_to_csv(user, filepath: str = None) -> str:
         filepath = f"/tmp/trades_{user.username}.csv"
 
     df.to_csv(filepath, index=False)
-    return filepath
\ No newline at end of file
+    return filepath
+
+
+EXPORT_DATASETS = {
+    'transactions': (
+        Transaction,
+        'timestamp',
+        ['id', 'ticker', 'action', 'quantity', 'price_at_execution',
+         'brokerage', 'total_value', 'order_type', 'pnl', 'timestamp'],
+    ),
+    'snapshots': (
+        PortfolioSnapshot,
+        'date',
+        ['date', 'total_value', 'cash_balance', 'invested_value', 'daily_pnl'],
+    ),
+}
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def _export_chunk(model, order_field: str, fields: list, user, after) -> list:
+    """The next EXPORT_CHUNK_SIZE rows past `after` (order value, id), keyset-paged."""
+    rows = model.objects.filter(user=user)
+    if after:
+        rows = rows.filter(
+            Q(**{f'{order_field}__gt': after[0]}) | Q(**{order_field: after[0], 'id__gt': after[1]})
+        )
+    return list(
+        rows.order_by(order_field, 'id').values_list(order_field, 'id', *fields)[:EXPORT_CHUNK_SIZE]
+    )
+
+
+async def _export_rows(model, order_field: str, fields: list, user):
+    fetch = sync_to_async(_export_chunk)
+    after = None
+    while True:
+        chunk = await fetch(model, order_field, fields, user, after)
+        for row in chunk:
+            yield row[2:]
+        if len(chunk) < EXPORT_CHUNK_SIZE:
+            return
+        after = chunk[-1][:2]
+
+
+def stream_export(user, dataset: str, output: str = 'csv'):
+    """
+    An async iterator of a user's rows as CSV or NDJSON lines, oldest first.
+    Rows are fetched EXPORT_CHUNK_SIZE at a time by keyset over (order field,
+    id) and written out one at a time, so memory stays flat however long the
+    history is. Async so the ASGI server streams it instead of buffering it.
+    """
+    if dataset not in EXPORT_DATASETS:
+        raise ValueError(f"dataset must be one of: {', '.join(EXPORT_DATASETS)}")
+    if output not in EXPORT_FORMATS:
+        raise ValueError(f"output must be one of: {', '.join(EXPORT_FORMATS)}")
+    return _export_lines(user, dataset, output)
+
+
+async def _export_lines(user, dataset: str, output: str):
+    model, order_field, fields = EXPORT_DATASETS[dataset]
+    rows = _export_rows(model, order_field, fields, user)
+
+    if output == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(fields)
+        async for row in rows:
+            yield writer.writerow(row)
+    else:
+        encoder = DjangoJSONEncoder()
+        async for row in rows:
+            yield encoder.encode(dict(zip(fields, row))) + '\n'
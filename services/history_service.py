@@ -0,0 +1,195 @@
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+import redis
+import yfinance as yf
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from services.http_cache import make_etag
+from services.price_service import _nse_ticker
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+# range -> (yfinance period, source bar interval, cache TTL in seconds)
+RANGES = {
+    '1d': ('1d', '1m', 60),
+    '5d': ('5d', '5m', 60 * 5),
+    '1mo': ('1mo', '30m', 60 * 15),
+    '3mo': ('3mo', '1h', 60 * 30),
+    '6mo': ('6mo', '1d', 60 * 60),
+    '1y': ('1y', '1d', 60 * 60),
+    '5y': ('5y', '1d', 60 * 60 * 6),
+}
+MODES = ('ohlc', 'line')
+DEFAULT_POINTS = 300
+MIN_POINTS = 20
+MAX_POINTS = 1000
+
+OHLC_FIELDS = ('t', 'o', 'h', 'l', 'c', 'v')
+LINE_FIELDS = ('t', 'c')
+# Bars missing any of these are dropped: NaN would not survive json.dumps as JSON
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+
+
+class NoHistory(Exception):
+    pass
+
+
+def _bars_key(ticker: str, range_: str) -> str:
+    return f"bars:{ticker}:{range_}"
+
+
+def _series_key(ticker: str, range_: str, mode: str, points: int) -> str:
+    return f"history:{ticker}:{range_}:{mode}:{points}"
+
+
+def _download_bars(ticker: str, range_: str) -> dict | None:
+    period, interval, _ = RANGES[range_]
+    try:
+        data = yf.download(
+            _nse_ticker(ticker), period=period, interval=interval,
+            progress=False, auto_adjust=False,
+        )
+    except Exception as e:
+        logger.warning(f"History download failed for {ticker} ({range_}): {e}")
+        return None
+
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+    if not set(PRICE_COLUMNS).issubset(data.columns):
+        return None
+    data = data.dropna(subset=PRICE_COLUMNS)
+    if data.empty:
+        return None
+
+    index = pd.DatetimeIndex(data.index)
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    return {
+        't': index.as_unit('s').asi8.tolist(),
+        'o': data['Open'].round(2).tolist(),
+        'h': data['High'].round(2).tolist(),
+        'l': data['Low'].round(2).tolist(),
+        'c': data['Close'].round(2).tolist(),
+        'v': data['Volume'].fillna(0).astype('int64').tolist(),
+        'fetched_at': timezone.now().replace(microsecond=0).isoformat(),
+    }
+
+
+def get_bars(ticker: str, range_: str) -> dict:
+    """
+    Raw OHLCV columns for a range from the Redis bar store, downloading
+    once per TTL. All users and resolutions of a range share one entry.
+    """
+    key = _bars_key(ticker, range_)
+    cached = redis_client.get(key)
+    if cached:
+        return json.loads(cached)
+
+    bars = _download_bars(ticker, range_)
+    if bars is None:
+        raise NoHistory(f"No price history for {ticker}")
+    redis_client.setex(key, RANGES[range_][2], json.dumps(bars, separators=(',', ':')))
+    return bars
+
+
+def bucket_ohlc(bars: dict, points: int) -> list:
+    """
+    Aggregate into at most `points` candles of consecutive bars: first open,
+    highest high, lowest low, last close, summed volume. Exact for candles.
+    """
+    t, o, h, l, c, v = (np.asarray(bars[f]) for f in OHLC_FIELDS)
+    if len(t) <= points:
+        return [list(row) for row in zip(t.tolist(), o.tolist(), h.tolist(), l.tolist(), c.tolist(), v.tolist())]
+
+    starts = np.linspace(0, len(t), points + 1).astype(int)[:-1]
+    ends = np.append(starts[1:], len(t)) - 1
+    return [
+        list(row) for row in zip(
+            t[starts].tolist(),
+            o[starts].tolist(),
+            np.maximum.reduceat(h, starts).tolist(),
+            np.minimum.reduceat(l, starts).tolist(),
+            c[ends].tolist(),
+            np.add.reduceat(v, starts).tolist(),
+        )
+    ]
+
+
+def lttb_indices(t, c, points: int) -> list:
+    """
+    Largest-Triangle-Three-Buckets: the indices of the `points` samples that
+    best preserve the visual shape of the (t, c) line, first and last included.
+    """
+    t = np.asarray(t, dtype=float)
+    c = np.asarray(c, dtype=float)
+    n = len(t)
+    if n <= points or points < 3:
+        return list(range(n))
+
+    edges = np.linspace(1, n - 1, points - 1).astype(int)
+    selected = [0]
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_t = t[next_start:next_end].mean()
+        avg_c = c[next_start:next_end].mean()
+
+        prev = selected[-1]
+        area = np.abs(
+            (t[prev] - avg_t) * (c[start:end] - c[prev])
+            - (t[prev] - t[start:end]) * (avg_c - c[prev])
+        )
+        selected.append(start + int(area.argmax()))
+    selected.append(n - 1)
+    return selected
+
+
+def lttb(bars: dict, points: int) -> list:
+    """LTTB over the closes, as [t, close] pairs."""
+    t, c = bars['t'], bars['c']
+    return [[int(t[i]), float(c[i])] for i in lttb_indices(t, c, points)]
+
+
+def get_history(ticker: str, range_: str, mode: str, points: int) -> dict:
+    """
+    The downsampled series for (ticker, range, mode, points) as a
+    pre-serialized {"body", "etag", "last_modified"} entry, cached as long
+    as the bars it was built from.
+    """
+    key = _series_key(ticker, range_, mode, points)
+    cached = redis_client.get(key)
+    if cached:
+        entry = json.loads(cached)
+    else:
+        bars = get_bars(ticker, range_)
+        series = bucket_ohlc(bars, points) if mode == 'ohlc' else lttb(bars, points)
+        body = json.dumps({
+            'ticker': ticker,
+            'range': range_,
+            'interval': RANGES[range_][1],
+            'mode': mode,
+            'source_bars': len(bars['t']),
+            'fields': OHLC_FIELDS if mode == 'ohlc' else LINE_FIELDS,
+            'bars': series,
+        }, separators=(',', ':'))
+        entry = {
+            'body': body,
+            'etag': make_etag(key, bars['fetched_at']),
+            'last_modified': bars['fetched_at'],
+        }
+        # Expire together with the bars it came from
+        ttl = redis_client.ttl(_bars_key(ticker, range_))
+        redis_client.setex(key, ttl if ttl > 0 else RANGES[range_][2], json.dumps(entry))
+
+    entry['last_modified'] = parse_datetime(entry['last_modified'])
+    return entry
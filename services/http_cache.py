@@ -0,0 +1,41 @@
+import hashlib
+
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag over whatever uniquely identifies a representation."""
+    digest = hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def set_validators(response, etag: str = None, last_modified=None, **cache_control):
+    """
+    Attach ETag / Last-Modified and Cache-Control to a response. Defaults to
+    `private, no-cache`: clients keep a copy but revalidate it on every use,
+    which costs them a 304 instead of the full body.
+    """
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, **(cache_control or {'private': True, 'no_cache': True}))
+    return response
+
+
+def not_modified(request, etag: str = None, last_modified=None, **cache_control):
+    """
+    A 304 carrying the same validators if the request's If-None-Match /
+    If-Modified-Since still match, otherwise None. Call it before doing the
+    expensive part of a view.
+    """
+    conditional = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if conditional is None or conditional.status_code != 304:
+        return conditional
+    return set_validators(HttpResponseNotModified(), etag, last_modified, **cache_control)
@@ -0,0 +1,158 @@
+import json
+import time
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+from services.csv_export_service import build_trade_dataframe
+from services.ml.llm_report import stream_report
+from services.ml_service import run_analysis_from_df
+from trading.models import Transaction
+
+redis_client = redis.Redis.from_url(settings.CELERY_BROKER_URL, decode_responses=True)
+async_redis_client = redis.asyncio.Redis.from_url(settings.CELERY_BROKER_URL, decode_responses=True)
+
+# Results are keyed on the user's latest transaction, so a new trade makes the
+# old entry unreachable on its own; the TTL only reclaims the space.
+INSIGHTS_TTL = 60 * 60 * 24 * 7
+JOB_TTL = 60 * 10
+# Matches Celery's default result_expires, after which the job result is gone anyway
+JOB_OWNER_TTL = 60 * 60 * 24
+# A job's progress events outlive the job only long enough for late readers to replay them
+PROGRESS_TTL = JOB_TTL
+# Report tokens are batched into one event at most this often
+PROGRESS_FLUSH_SECONDS = 0.1
+
+INSUFFICIENT_DATA = {
+    'status': 'insufficient_data',
+    'message': 'You need at least one completed trade (a buy followed by a sell) before we can analyze your trading patterns.',
+    'insights': []
+}
+
+
+def _result_key(user_id: int, txn_id: int) -> str:
+    return f"insights:result:{user_id}:{txn_id}"
+
+
+def _job_key(user_id: int, txn_id: int) -> str:
+    return f"insights:job:{user_id}:{txn_id}"
+
+
+def _owner_key(job_id: str) -> str:
+    return f"insights:owner:{job_id}"
+
+
+def _progress_key(user_id: int, txn_id: int) -> str:
+    return f"insights:progress:{user_id}:{txn_id}"
+
+
+def latest_transaction_id(user) -> int | None:
+    return Transaction.objects.filter(user=user).order_by('-id').values_list('id', flat=True).first()
+
+
+def get_cached_insights(user_id: int, txn_id: int) -> dict | None:
+    cached = redis_client.get(_result_key(user_id, txn_id))
+    return json.loads(cached) if cached else None
+
+
+def store_insights(user_id: int, txn_id: int, payload: dict) -> None:
+    redis_client.setex(_result_key(user_id, txn_id), INSIGHTS_TTL, json.dumps(payload, default=str))
+
+
+def claim_job(user_id: int, txn_id: int, job_id: str) -> tuple:
+    """
+    Register `job_id` as the insights job for this (user, latest transaction).
+    Returns (job_id, created) — an already-running job wins over the new one.
+    A new job starts from an empty progress stream, so followers don't
+    replay the `error` of a failed earlier attempt.
+    """
+    key = _job_key(user_id, txn_id)
+    pipeline = redis_client.pipeline()
+    pipeline.set(key, job_id, nx=True, ex=JOB_TTL)
+    pipeline.get(key)
+    created, current = pipeline.execute()
+    if created:
+        pipeline = redis_client.pipeline()
+        pipeline.setex(_owner_key(job_id), JOB_OWNER_TTL, user_id)
+        pipeline.delete(_progress_key(user_id, txn_id))
+        pipeline.execute()
+    return current, bool(created)
+
+
+def release_job(user_id: int, txn_id: int) -> None:
+    redis_client.delete(_job_key(user_id, txn_id))
+
+
+def job_owner(job_id: str) -> int | None:
+    owner = redis_client.get(_owner_key(job_id))
+    return int(owner) if owner else None
+
+
+def publish_progress(user_id: int, txn_id: int, event: str, data: dict) -> None:
+    """
+    Append an event to the job's progress stream: `analytics`, `token`, then
+    `done` or `error`. A Redis stream rather than pub/sub, so a reader that
+    arrives mid-job replays everything from the start.
+    """
+    key = _progress_key(user_id, txn_id)
+    pipeline = redis_client.pipeline()
+    pipeline.xadd(key, {'event': event, 'data': json.dumps(data, default=str)})
+    pipeline.expire(key, PROGRESS_TTL)
+    pipeline.execute()
+
+
+async def follow_progress(user_id: int, txn_id: int, idle_seconds: int, timeout: int = PROGRESS_TTL):
+    """
+    Yield (event, data) from a job's progress stream until `done` or
+    `error`, and (None, None) whenever `idle_seconds` pass without one so the
+    caller can keep its connection alive.
+    """
+    key = _progress_key(user_id, txn_id)
+    last_id = '0'
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = await async_redis_client.xread({key: last_id}, block=idle_seconds * 1000)
+        if not response:
+            yield None, None
+            continue
+        for _, entries in response:
+            for entry_id, fields in entries:
+                last_id = entry_id
+                yield fields['event'], json.loads(fields['data'])
+                if fields['event'] in ('done', 'error'):
+                    return
+    yield 'error', {'status': 'error', 'message': 'Timed out waiting for insights.'}
+
+
+def compute_insights(user, txn_id: int) -> dict:
+    """
+    Build the trade DataFrame, run the analytics and the LLM report,
+    publishing the analytics and the report tokens as progress on the way.
+    """
+    df = build_trade_dataframe(user)
+
+    if df.empty:
+        return INSUFFICIENT_DATA
+
+    analytics = run_analysis_from_df(df)
+    publish_progress(user.id, txn_id, 'analytics', analytics)
+
+    parts, pending = [], []
+    flushed_at = time.monotonic()
+    for token in stream_report(analytics):
+        parts.append(token)
+        pending.append(token)
+        if time.monotonic() - flushed_at >= PROGRESS_FLUSH_SECONDS:
+            publish_progress(user.id, txn_id, 'token', {'token': ''.join(pending)})
+            pending.clear()
+            flushed_at = time.monotonic()
+    if pending:
+        publish_progress(user.id, txn_id, 'token', {'token': ''.join(pending)})
+
+    return {
+        'status': 'ok',
+        'total_completed_trades': len(df),
+        'analytics': analytics,
+        'report': ''.join(parts),
+    }
@@ -0,0 +1,134 @@
+import json
+from datetime import timedelta
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+from market.utils import IST
+
+redis_client = redis.Redis.from_url(settings.CELERY_BROKER_URL, decode_responses=True)
+
+LEADERBOARD_KEY = "leaderboard:returns"
+LEADERBOARD_META_KEY = "leaderboard:meta"
+
+WINDOWS = ('all', 'daily', 'weekly', 'monthly')
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Window boards outlive their period by a day so the previous board can still be read
+# right after rollover; after that Redis drops them on its own.
+WINDOW_TTLS = {
+    'daily': int(timedelta(days=2).total_seconds()),
+    'weekly': int(timedelta(days=8).total_seconds()),
+    'monthly': int(timedelta(days=32).total_seconds()),
+}
+
+# One round trip: the page of the sorted set, its display metadata and the board size.
+_PAGE_SCRIPT = redis_client.register_script("""
+local rows = redis.call('ZREVRANGE', KEYS[1], ARGV[1], ARGV[2], 'WITHSCORES')
+local names = {}
+for i = 1, #rows, 2 do names[#names + 1] = rows[i] end
+local meta = {}
+if #names > 0 then meta = redis.call('HMGET', KEYS[2], unpack(names)) end
+return {rows, meta, redis.call('ZCARD', KEYS[1])}
+""")
+
+# One round trip: the caller's rank via ZREVRANK plus the neighbours on either side.
+_AROUND_SCRIPT = redis_client.register_script("""
+local total = redis.call('ZCARD', KEYS[1])
+local rank = redis.call('ZREVRANK', KEYS[1], ARGV[1])
+if not rank then return {-1, {}, {}, total} end
+local start = rank - tonumber(ARGV[2])
+if start < 0 then start = 0 end
+local rows = redis.call('ZREVRANGE', KEYS[1], start, rank + tonumber(ARGV[2]), 'WITHSCORES')
+local names = {}
+for i = 1, #rows, 2 do names[#names + 1] = rows[i] end
+local meta = redis.call('HMGET', KEYS[2], unpack(names))
+return {rank, rows, meta, total}
+""")
+
+
+def window_start(window: str, today=None):
+    """First IST calendar date covered by a windowed board."""
+    today = today or timezone.now().astimezone(IST).date()
+    if window == 'daily':
+        return today
+    if window == 'weekly':
+        return today - timedelta(days=today.weekday())
+    if window == 'monthly':
+        return today.replace(day=1)
+    raise ValueError(f"Unknown leaderboard window: {window}")
+
+
+def board_key(window: str = 'all', today=None) -> str:
+    """Redis key of the sorted set backing a window's current period."""
+    if window == 'all':
+        return LEADERBOARD_KEY
+    today = today or timezone.now().astimezone(IST).date()
+    if window == 'daily':
+        period = today.isoformat()
+    elif window == 'weekly':
+        year, week, _ = today.isocalendar()
+        period = f"{year}-W{week:02d}"
+    elif window == 'monthly':
+        period = today.strftime('%Y-%m')
+    else:
+        raise ValueError(f"Unknown leaderboard window: {window}")
+    return f"{LEADERBOARD_KEY}:{window}:{period}"
+
+
+def _rows(flat: list, meta: list, first_rank: int) -> list:
+    rows = []
+    for idx in range(0, len(flat), 2):
+        username = flat[idx]
+        raw_meta = meta[idx // 2] if idx // 2 < len(meta) else None
+        rows.append({
+            "rank": first_rank + idx // 2 + 1,
+            "username": username,
+            "return_pct": round(float(flat[idx + 1]), 2),
+            **(json.loads(raw_meta) if raw_meta else {}),
+        })
+    return rows
+
+
+def get_leaderboard_page(window: str = 'all', cursor: int = 0, limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    """
+    Read one page of a leaderboard starting at rank offset `cursor`.
+    `next_cursor` is None once the end of the board is reached.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    cursor = max(0, cursor)
+
+    flat, meta, total = _PAGE_SCRIPT(
+        keys=[board_key(window), LEADERBOARD_META_KEY],
+        args=[cursor, cursor + limit - 1],
+    )
+    results = _rows(flat, meta, cursor)
+    next_cursor = cursor + limit if cursor + limit < total else None
+
+    return {
+        "window": window,
+        "total": total,
+        "results": results,
+        "next_cursor": next_cursor,
+    }
+
+
+def get_rank_around(username: str, window: str = 'all', radius: int = 5) -> dict:
+    """The user's own rank on a board, with up to `radius` neighbours above and below."""
+    radius = max(0, min(radius, 25))
+
+    rank, flat, meta, total = _AROUND_SCRIPT(
+        keys=[board_key(window), LEADERBOARD_META_KEY],
+        args=[username, radius],
+    )
+    if rank < 0:
+        return {"window": window, "total": total, "rank": None, "results": []}
+
+    return {
+        "window": window,
+        "total": total,
+        "rank": rank + 1,
+        "results": _rows(flat, meta, max(rank - radius, 0)),
+    }
@@ -0,0 +1,114 @@
+import redis
+from django.conf import settings
+
+from market.symbols import INDEX_MEMBERS, INDEX_WEIGHTS, MEMBERSHIPS, SECTORS
+
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+# symbol -> the change_percent it last contributed to the aggregates
+LAST_CHANGE_KEY = "market:agg:last"
+
+# Apply one quote to every aggregate its symbol belongs to, atomically.
+# Each aggregate hash holds running sums: wsum (weight * change), wtotal
+# (weight of quoted members), count, adv / dec / unch. A repeat quote only
+# moves wsum by the delta and shifts breadth if the sign flipped, so the
+# cost is O(memberships) however many symbols an aggregate has.
+# KEYS: last-change hash, aggregate hashes...  ARGV: symbol, change, weights...
+_APPLY_QUOTE_SCRIPT = redis_client.register_script("""
+local function side(x)
+  if x > 0 then return 'adv' elseif x < 0 then return 'dec' else return 'unch' end
+end
+local new = tonumber(ARGV[2])
+local old = redis.call('HGET', KEYS[1], ARGV[1])
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+for i = 2, #KEYS do
+  local w = tonumber(ARGV[i + 1])
+  if old then
+    local o = tonumber(old)
+    redis.call('HINCRBYFLOAT', KEYS[i], 'wsum', w * (new - o))
+    if side(o) ~= side(new) then
+      redis.call('HINCRBY', KEYS[i], side(o), -1)
+      redis.call('HINCRBY', KEYS[i], side(new), 1)
+    end
+  else
+    redis.call('HINCRBYFLOAT', KEYS[i], 'wsum', w * new)
+    redis.call('HINCRBYFLOAT', KEYS[i], 'wtotal', w)
+    redis.call('HINCRBY', KEYS[i], 'count', 1)
+    redis.call('HINCRBY', KEYS[i], side(new), 1)
+  end
+end
+return 1
+""")
+
+
+def _aggregate_key(kind: str, name: str) -> str:
+    return f"market:agg:{kind}:{name}"
+
+
+def apply_quote(symbol: str, change_percent) -> None:
+    """Fold a fresh quote into its sector and index aggregates (no-op for unknown symbols)."""
+    memberships = MEMBERSHIPS.get(symbol)
+    if not memberships or change_percent is None:
+        return
+    _APPLY_QUOTE_SCRIPT(
+        keys=[LAST_CHANGE_KEY] + [_aggregate_key(kind, name) for kind, name, _ in memberships],
+        args=[symbol, float(change_percent)] + [weight for _, _, weight in memberships],
+    )
+
+
+def rebuild_aggregates() -> int:
+    """
+    Recompute every aggregate from the last change per symbol. Clears the
+    float drift of many incremental updates and picks up registry changes.
+    """
+    last = {symbol: float(change) for symbol, change in redis_client.hgetall(LAST_CHANGE_KEY).items()}
+    groups = [("sector", sector, {s: 1.0 for s in members}) for sector, members in SECTORS.items()]
+    groups += [("index", index, weights) for index, weights in INDEX_WEIGHTS.items()]
+
+    pipeline = redis_client.pipeline(transaction=True)
+    for kind, name, weights in groups:
+        state = {"wsum": 0.0, "wtotal": 0.0, "count": 0, "adv": 0, "dec": 0, "unch": 0}
+        for symbol, weight in weights.items():
+            change = last.get(symbol)
+            if change is None:
+                continue
+            state["wsum"] += weight * change
+            state["wtotal"] += weight
+            state["count"] += 1
+            state["adv" if change > 0 else "dec" if change < 0 else "unch"] += 1
+        key = _aggregate_key(kind, name)
+        pipeline.delete(key)
+        pipeline.hset(key, mapping=state)
+    pipeline.execute()
+    return len(groups)
+
+
+def _summaries(kind: str, members: dict) -> list:
+    names = list(members)
+    pipeline = redis_client.pipeline(transaction=False)
+    for name in names:
+        pipeline.hgetall(_aggregate_key(kind, name))
+
+    rows = []
+    for name, state in zip(names, pipeline.execute()):
+        wtotal = float(state.get("wtotal", 0))
+        adv, dec = int(state.get("adv", 0)), int(state.get("dec", 0))
+        rows.append({
+            "name": name,
+            "change_percent": round(float(state.get("wsum", 0)) / wtotal, 2) if wtotal else None,
+            "advancers": adv,
+            "decliners": dec,
+            "unchanged": int(state.get("unch", 0)),
+            "breadth": round(adv / (adv + dec), 2) if adv + dec else None,
+            "quoted": int(state.get("count", 0)),
+            "constituents": len(members[name]),
+        })
+    return sorted(rows, key=lambda r: (r["change_percent"] is None, -(r["change_percent"] or 0)))
+
+
+def sector_summaries() -> list:
+    return _summaries("sector", SECTORS)
+
+
+def index_summaries() -> list:
+    return _summaries("index", INDEX_MEMBERS)
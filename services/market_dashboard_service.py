@@ -0,0 +1,112 @@
+import json
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from market.symbols import index_members
+from market.utils import get_market_status
+from services.http_cache import make_etag
+from services.price_service import get_quotes
+
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+DASHBOARD_KEY = "market:dashboard"
+# A few producer ticks; if the producer stops, the endpoint rebuilds inline
+DASHBOARD_TTL = 120
+# What browsers / proxies may reuse without asking, just under one producer tick
+DASHBOARD_MAX_AGE = 15
+REBUILD_LOCK_KEY = "market:dashboard:rebuild"
+# Longer than a cold build of the whole index takes
+REBUILD_LOCK_TTL = 60
+MOVERS_COUNT = 5
+
+
+def _row(ticker: str, p: dict | None) -> dict:
+    if not p:
+        return {
+            "ticker": ticker,
+            "price": None,
+            "change": 0,
+            "change_percent": 0,
+            "volume": None,
+            "source": "unavailable",
+        }
+    return {
+        "ticker": ticker,
+        "price": p.get("price"),
+        "change": p.get("change", 0),
+        "change_percent": p.get("change_percent", 0),
+        "volume": p.get("volume"),
+        "source": p.get("source"),
+    }
+
+
+def build_dashboard(symbols=None) -> dict:
+    """
+    Compute the shared market dashboard over `symbols` (NIFTY 50 by default)
+    and store it pre-serialized.
+    The ETag covers the movers and open/closed state only, so a tick that
+    changes nothing keeps the old entry and clients keep getting 304s.
+    """
+    symbols = symbols or index_members("NIFTY50")
+    prices = get_quotes(symbols)
+    rows = [_row(ticker, prices.get(ticker)) for ticker in symbols]
+    quoted = [row for row in rows if row["price"] is not None]
+
+    by_change = sorted(quoted, key=lambda r: r["change_percent"] or 0, reverse=True)
+    most_active = sorted(
+        (row for row in quoted if row["volume"]), key=lambda r: r["volume"], reverse=True
+    )
+    status = get_market_status()
+    payload = {
+        "gainers": by_change[:MOVERS_COUNT],
+        "losers": by_change[-MOVERS_COUNT:][::-1],
+        "most_active": most_active[:MOVERS_COUNT],
+        "market_status": status,
+    }
+    etag = make_etag(json.dumps(
+        [payload["gainers"], payload["losers"], payload["most_active"], status["is_open"]],
+        sort_keys=True,
+    ))
+
+    if redis_client.hget(DASHBOARD_KEY, "etag") == etag:
+        redis_client.expire(DASHBOARD_KEY, DASHBOARD_TTL)
+        return {"etag": etag, "changed": False}
+
+    generated_at = timezone.now().replace(microsecond=0)
+    payload["generated_at"] = generated_at.isoformat()
+    entry = {
+        "body": json.dumps(payload, separators=(",", ":")),
+        "etag": etag,
+        "generated_at": generated_at.isoformat(),
+    }
+    pipeline = redis_client.pipeline(transaction=True)
+    pipeline.hset(DASHBOARD_KEY, mapping=entry)
+    pipeline.expire(DASHBOARD_KEY, DASHBOARD_TTL)
+    pipeline.execute()
+    return {"etag": etag, "changed": True}
+
+
+def try_build_dashboard() -> bool:
+    """
+    build_dashboard for a request that found no dashboard. Only one caller
+    across all workers builds at a time; the others get False right away
+    instead of each fanning out to the upstream quote APIs.
+    """
+    if not redis_client.set(REBUILD_LOCK_KEY, 1, nx=True, ex=REBUILD_LOCK_TTL):
+        return False
+    try:
+        build_dashboard()
+    finally:
+        redis_client.delete(REBUILD_LOCK_KEY)
+    return True
+
+
+def get_dashboard() -> dict | None:
+    """The stored dashboard as {"body", "etag", "generated_at"}, in one round trip."""
+    body, etag, generated_at = redis_client.hmget(DASHBOARD_KEY, "body", "etag", "generated_at")
+    if body is None:
+        return None
+    return {"body": body, "etag": etag, "generated_at": parse_datetime(generated_at)}
@@ -1,8 +1,17 @@
 import os
 import json
+import hashlib
+import redis
+from django.conf import settings
 from dotenv import load_dotenv
 from groq import Groq
 
+load_dotenv()
+
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+REPORT_CACHE_TTL = 60 * 60 * 24 * 3
+
 SYSTEM_PROMPT = """\
 You are an expert trading coach and quantitative performance analyst. You will be 
 given a JSON object containing a trader's statistical analysis data. Your job is to 
@@ -25,6 +34,8 @@ the trader genuinely understand their performance and improve.
    behavior, strategy, or psychology?
 7. Cross-reference segments where relevant. Look for overlapping patterns across 
    trend, volatility, and time of day. Do not treat each segment in isolation.
+   The `cross_segments` section gives exact metrics for each combination of 
+   conditions — use it rather than guessing which trades overlap.
 8. Write as a knowledgeable but friendly mentor speaking to a beginner or 
    intermediate trader. Be warm and encouraging, but honest and direct about 
    weaknesses. Avoid jargon — if you use a trading term, briefly explain it.
@@ -124,21 +135,97 @@ def build_prompt(analytics_json: dict) -> str:
     )
 
 
+# Any edit to the system prompt or the user prompt template changes the
+# version, which orphans every cached report
+PROMPT_VERSION = hashlib.sha256((SYSTEM_PROMPT + build_prompt({})).encode()).hexdigest()[:12]
+
+_client = None
+
+
+def _get_client() -> Groq:
+    global _client
+    if _client is None:
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key or api_key == "your_api_key_here":
+            raise ValueError("GROQ_API_KEY is not set in .env file.")
+        _client = Groq(api_key=api_key)
+    return _client
+
+
+def report_cache_key(analytics_json: dict, model: str, temperature: float, max_tokens: int) -> str:
+    """Content address of a report: the analytics plus everything that shapes the completion."""
+    payload = json.dumps(
+        {
+            "analytics": analytics_json,
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "prompt_version": PROMPT_VERSION,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return f"llm_report:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+def _cached_report(cache_key: str) -> str | None:
+    # The cache is an optimisation: if Redis is down, go to the model
+    try:
+        return redis_client.get(cache_key)
+    except redis.RedisError:
+        return None
+
+
+def _store_report(cache_key: str, report: str) -> None:
+    try:
+        redis_client.setex(cache_key, REPORT_CACHE_TTL, report)
+    except redis.RedisError:
+        pass
+
+
 def generate_report(
     analytics_json: dict,
     model: str = "llama-3.3-70b-versatile",
     temperature: float = 0.3,
     max_tokens: int = 3000,
 ) -> str:
-    load_dotenv()
+    cache_key = report_cache_key(analytics_json, model, temperature, max_tokens)
+    cached = _cached_report(cache_key)
+    if cached:
+        return cached
 
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key or api_key == "your_api_key_here":
-        raise ValueError("GROQ_API_KEY is not set in .env file.")
+    chat_completion = _get_client().chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": build_prompt(analytics_json)},
+        ],
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+
+    report = chat_completion.choices[0].message.content
+    _store_report(cache_key, report)
+    return report
 
-    client = Groq(api_key=api_key)
 
-    chat_completion = client.chat.completions.create(
+def stream_report(
+    analytics_json: dict,
+    model: str = "llama-3.3-70b-versatile",
+    temperature: float = 0.3,
+    max_tokens: int = 3000,
+):
+    """
+    Yield the report in chunks as Groq generates it. A cached report is
+    yielded whole; a freshly streamed one is cached once it completes.
+    """
+    cache_key = report_cache_key(analytics_json, model, temperature, max_tokens)
+    cached = _cached_report(cache_key)
+    if cached:
+        yield cached
+        return
+
+    stream = _get_client().chat.completions.create(
         model=model,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -146,6 +233,14 @@ def generate_report(
         ],
         temperature=temperature,
         max_tokens=max_tokens,
+        stream=True,
     )
 
-    return chat_completion.choices[0].message.content
\ No newline at end of file
+    parts = []
+    for chunk in stream:
+        token = chunk.choices[0].delta.content if chunk.choices else None
+        if token:
+            parts.append(token)
+            yield token
+
+    _store_report(cache_key, "".join(parts))
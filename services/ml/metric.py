@@ -1,23 +1,46 @@
-def compute_metrics(df):
-    if len(df) == 0:
+import pandas as pd
+
+TOTAL_COLUMNS = ["trades", "wins", "win_pnl", "loss_pnl"]
+
+
+def outcome_totals(df):
+    """Per-trade additive columns that every metric can be derived from after a sum."""
+    pnl = df["pnl"].astype(float)
+    win = pnl > 0
+    return pd.DataFrame({
+        "trades": 1,
+        "wins": win.astype(int),
+        "win_pnl": pnl.where(win, 0.0),
+        "loss_pnl": pnl.where(pnl <= 0, 0.0),
+    }, index=df.index)
+
+
+def metrics_from_totals(trades, wins, win_pnl, loss_pnl):
+    if trades == 0:
         return None
 
-    total_trades = len(df)
-    wins = df[df["pnl"] > 0]
-    losses = df[df["pnl"] <= 0]
-    win_rate = len(wins) / total_trades
-    avg_win = wins["pnl"].mean() if len(wins) > 0 else 0.0
-    avg_loss = abs(losses["pnl"].mean()) if len(losses) > 0 else 0.0
+    total_trades = int(trades)
+    losses = total_trades - int(wins)
+    win_rate = wins / total_trades
+    avg_win = win_pnl / wins if wins > 0 else 0.0
+    avg_loss = abs(loss_pnl / losses) if losses > 0 else 0.0
     expectancy = (win_rate * avg_win) - ((1 - win_rate) * avg_loss)
-    total_profit = wins["pnl"].sum()
-    total_loss = abs(losses["pnl"].sum())
+    total_profit = win_pnl
+    total_loss = abs(loss_pnl)
     profit_factor = total_profit / total_loss if total_loss > 0 else None
 
     return {
         "total_trades": total_trades,
-        "win_rate": round(win_rate, 3),
-        "avg_win": round(avg_win, 2),
-        "avg_loss": round(avg_loss, 2),
-        "expectancy": round(expectancy, 2),
-        "profit_factor": round(profit_factor, 2) if profit_factor else None,
-    }
\ No newline at end of file
+        "win_rate": round(float(win_rate), 3),
+        "avg_win": round(float(avg_win), 2),
+        "avg_loss": round(float(avg_loss), 2),
+        "expectancy": round(float(expectancy), 2),
+        "profit_factor": round(float(profit_factor), 2) if profit_factor else None,
+    }
+
+
+def compute_metrics(df):
+    if len(df) == 0:
+        return None
+
+    return metrics_from_totals(*outcome_totals(df)[TOTAL_COLUMNS].sum())
@@ -1,13 +1,57 @@
-from services.ml.metric import compute_metrics
+from services.ml.metric import TOTAL_COLUMNS, metrics_from_totals, outcome_totals
+
+
+def segment_all(df, columns):
+    """
+    Metrics for every value of every column in `columns` ({segment name: column}).
+    The columns are melted into one long (column, value) frame so a single
+    groupby-sum covers all of them, instead of one boolean filter per value.
+    """
+    results = {name: {} for name in columns}
+    present = {name: column for name, column in columns.items() if column in df.columns}
+    if not present or len(df) == 0:
+        return results
+
+    value_columns = list(dict.fromkeys(present.values()))
+    long = (
+        outcome_totals(df)
+        .join(df[value_columns])
+        .melt(id_vars=TOTAL_COLUMNS, value_vars=value_columns, var_name="column", value_name="value")
+        .dropna(subset=["value"])
+    )
+    long["value"] = long["value"].astype(str)
+    sums = long.groupby(["column", "value"], sort=False)[TOTAL_COLUMNS].sum()
+
+    by_column = {}
+    for (column, value), trades, wins, win_pnl, loss_pnl in sums.itertuples(name=None):
+        by_column.setdefault(column, {})[value] = metrics_from_totals(trades, wins, win_pnl, loss_pnl)
+
+    for name, column in present.items():
+        results[name] = by_column.get(column, {})
+    return results
 
 
 def segment_by_column(df, column):
-    if column not in df.columns:
+    return segment_all(df, {column: column})[column]
+
+
+def cross_segment(df, columns):
+    """
+    Metrics for every observed combination of `columns`, e.g. trend × volatility
+    × time_of_day, keyed as "UP | HIGH | morning".
+    """
+    if any(column not in df.columns for column in columns) or len(df) == 0:
         return {}
 
-    results = {}
-    for value in df[column].dropna().unique():
-        subset = df[df[column] == value]
-        results[str(value)] = compute_metrics(subset)
+    sums = (
+        outcome_totals(df)
+        .join(df[columns])
+        .groupby(columns, sort=False)[TOTAL_COLUMNS]
+        .sum()
+    )
 
-    return results
\ No newline at end of file
+    results = {}
+    for key, trades, wins, win_pnl, loss_pnl in sums.itertuples(name=None):
+        key = key if isinstance(key, tuple) else (key,)
+        results[" | ".join(str(part) for part in key)] = metrics_from_totals(trades, wins, win_pnl, loss_pnl)
+    return results
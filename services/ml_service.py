@@ -1,36 +1,45 @@
 import pandas as pd
 from services.ml.data_loader import validate_market_features
 from services.ml.metric import compute_metrics
-from services.ml.segmentation import segment_by_column
-from services.ml.llm_report import generate_report
-from services.ml.data_loader import validate_market_features
-from services.ml.metric import compute_metrics
-from services.ml.segmentation import segment_by_column
+from services.ml.segmentation import cross_segment, segment_all
 from services.ml.llm_report import generate_report
 
+SEGMENT_COLUMNS = {
+    "trend": "trend",
+    "volatility": "volatility",
+    "direction": "direction",
+    "time_of_day": "time_of_day_bucket",
+    "day_of_week": "day_of_week",
+}
+
+CROSS_SEGMENTS = {
+    "trend × volatility": ["trend", "volatility"],
+    "trend × time_of_day": ["trend", "time_of_day_bucket"],
+    "volatility × time_of_day": ["volatility", "time_of_day_bucket"],
+    "trend × volatility × time_of_day": ["trend", "volatility", "time_of_day_bucket"],
+}
+
 
 def run_analysis_from_df(df: pd.DataFrame) -> dict:
     df = validate_market_features(df)
 
     overall = compute_metrics(df)
-
-    segmentation = {
-        "trend": segment_by_column(df, "trend"),
-        "volatility": segment_by_column(df, "volatility"),
-        "direction": segment_by_column(df, "direction"),
-        "time_of_day": segment_by_column(df, "time_of_day_bucket"),
-        "day_of_week": segment_by_column(df, "day_of_week"),
+    segmentation = segment_all(df, SEGMENT_COLUMNS)
+    cross_segments = {
+        name: cross_segment(df, columns) for name, columns in CROSS_SEGMENTS.items()
     }
 
+    hold_times = df.groupby(df["pnl"] > 0)["holding_time"].mean()
     behavior = {
         "avg_holding_time": float(df["holding_time"].mean()),
-        "avg_win_hold_time": float(df[df["pnl"] > 0]["holding_time"].mean()) if len(df[df["pnl"] > 0]) > 0 else None,
-        "avg_loss_hold_time": float(df[df["pnl"] <= 0]["holding_time"].mean()) if len(df[df["pnl"] <= 0]) > 0 else None,
+        "avg_win_hold_time": float(hold_times[True]) if True in hold_times.index else None,
+        "avg_loss_hold_time": float(hold_times[False]) if False in hold_times.index else None,
     }
 
     return {
         "overall": overall,
         "segmentation": segmentation,
+        "cross_segments": cross_segments,
         "behavior": behavior,
     }
 
@@ -38,4 +47,4 @@ def run_analysis_from_df(df: pd.DataFrame) -> dict:
 def get_ml_insights(df: pd.DataFrame) -> tuple:
     analytics = run_analysis_from_df(df)
     report = generate_report(analytics)
-    return report, analytics
\ No newline at end of file
+    return report, analytics
@@ -0,0 +1,148 @@
+import json
+
+import numpy as np
+import redis
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max, Min, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from services.history_service import lttb_indices
+from services.http_cache import make_etag
+from trading.models import PortfolioSnapshot
+
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+RESOLUTIONS = ('auto', 'daily', 'weekly', 'monthly', 'lttb')
+DEFAULT_POINTS = 200
+MIN_POINTS = 20
+MAX_POINTS = 1000
+# 'auto' stays daily up to this many days, weekly up to AUTO_WEEKLY_DAYS, then monthly
+AUTO_DAILY_DAYS = 180
+AUTO_WEEKLY_DAYS = 3 * 365
+# Entries are keyed by the user's snapshot version, so the TTL only bounds memory
+CACHE_TTL = 60 * 60 * 24
+
+_TRUNC = {'weekly': TruncWeek, 'monthly': TruncMonth}
+_VALUE_FIELDS = ('total_value', 'cash_balance', 'invested_value')
+# The original response: a bare list of daily snapshots, decimals as strings
+LEGACY_FIELDS = ('date', *_VALUE_FIELDS, 'daily_pnl')
+
+
+def _version_key(user_id) -> str:
+    return f"pnl:{user_id}:version"
+
+
+def _entry_key(user_id, version, start, end, resolution, points) -> str:
+    return f"pnl:{user_id}:{version}:{start or ''}:{end or ''}:{resolution}:{points}"
+
+
+def invalidate_pnl_history(user_ids) -> None:
+    """
+    Bump each user's snapshot version so their cached P&L histories stop
+    matching. Version keys never expire: a reset could revive a stale entry.
+    """
+    pipeline = redis_client.pipeline(transaction=False)
+    for user_id in user_ids:
+        pipeline.incr(_version_key(user_id))
+    pipeline.execute()
+
+
+def _row(date, total_value, cash_balance, invested_value, pnl) -> dict:
+    return {
+        'date': date.isoformat(),
+        'total_value': float(total_value),
+        'cash_balance': float(cash_balance),
+        'invested_value': float(invested_value),
+        'pnl': round(float(pnl), 2),
+    }
+
+
+def _resolve(snapshots, resolution: str) -> str:
+    if resolution != 'auto':
+        return resolution
+    span = snapshots.aggregate(first=Min('date'), last=Max('date'))
+    if span['first'] is None:
+        return 'daily'
+    days = (span['last'] - span['first']).days
+    if days <= AUTO_DAILY_DAYS:
+        return 'daily'
+    return 'weekly' if days <= AUTO_WEEKLY_DAYS else 'monthly'
+
+
+def _rollup(snapshots, resolution: str) -> list:
+    """
+    One point per week / month, computed in the database: the period's last
+    snapshot for the values and the summed daily P&L for `pnl`.
+    """
+    periodic = snapshots.annotate(period=_TRUNC[resolution]('date'))
+    pnl = dict(
+        periodic.order_by().values('period').annotate(pnl=Sum('daily_pnl')).values_list('period', 'pnl')
+    )
+    closes = periodic.order_by('period', '-date').distinct('period').values_list(
+        'period', 'date', *_VALUE_FIELDS
+    )
+    return [_row(date, *values, pnl[period]) for period, date, *values in closes]
+
+
+def _downsample(snapshots, points: int) -> list:
+    """
+    LTTB over total_value. `pnl` on each kept point is the P&L summed since
+    the previous kept point, so the rows still add up to the full period.
+    """
+    rows = list(snapshots.order_by('date').values_list('date', *_VALUE_FIELDS, 'daily_pnl'))
+    if not rows:
+        return []
+    ordinals = [row[0].toordinal() for row in rows]
+    selected = lttb_indices(ordinals, [row[1] for row in rows], points)
+    cumulative = np.cumsum([float(row[4]) for row in rows])
+
+    result, previous = [], 0.0
+    for i in selected:
+        result.append(_row(*rows[i][:4], cumulative[i] - previous))
+        previous = cumulative[i]
+    return result
+
+
+def get_pnl_history(user_id, start=None, end=None, resolution=None, points=DEFAULT_POINTS) -> dict:
+    """
+    A user's P&L history between `start` and `end` (inclusive, open-ended if
+    None) at the given resolution, as a pre-serialized {"body", "etag"} entry.
+    A `resolution` of None gives the original bare list of daily rows.
+    Cached until the user's next snapshot bumps their version.
+    """
+    version = redis_client.get(_version_key(user_id)) or 0
+    key = _entry_key(user_id, version, start, end, resolution, points)
+    cached = redis_client.get(key)
+    if cached:
+        return json.loads(cached)
+
+    snapshots = PortfolioSnapshot.objects.filter(user_id=user_id)
+    if start:
+        snapshots = snapshots.filter(date__gte=start)
+    if end:
+        snapshots = snapshots.filter(date__lte=end)
+
+    if resolution is None:
+        body = json.dumps(
+            list(snapshots.order_by('date').values(*LEGACY_FIELDS)),
+            cls=DjangoJSONEncoder, separators=(',', ':'),
+        )
+    else:
+        resolved = _resolve(snapshots, resolution)
+        if resolved == 'daily':
+            rows = [_row(*row) for row in snapshots.order_by('date').values_list('date', *_VALUE_FIELDS, 'daily_pnl')]
+        elif resolved == 'lttb':
+            rows = _downsample(snapshots, points)
+        else:
+            rows = _rollup(snapshots, resolved)
+        body = json.dumps({
+            'from': start.isoformat() if start else None,
+            'to': end.isoformat() if end else None,
+            'resolution': resolved,
+            'results': rows,
+        }, separators=(',', ':'))
+
+    entry = {'body': body, 'etag': make_etag(key)}
+    redis_client.setex(key, CACHE_TTL, json.dumps(entry))
+    return entry
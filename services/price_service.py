@@ -1,19 +1,35 @@
+import asyncio
 import json
 import logging
+import math
 
 import finnhub
 import redis
+import redis.asyncio
 import yfinance as yf
+from asgiref.sync import sync_to_async
 from django.conf import settings
 
+from services.market_aggregates_service import apply_quote
+
 logger = logging.getLogger(__name__)
 
 redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+async_redis_client = redis.asyncio.from_url(settings.REDIS_URL, decode_responses=True)
 finnhub_client = finnhub.Client(api_key=settings.FINNHUB_API_KEY)
 
 CACHE_TTL = 30
 
 
+def _store_quote(symbol: str, data: dict) -> None:
+    redis_client.setex(f"price:{symbol}", CACHE_TTL, json.dumps(data))
+    # Every fresh quote also moves its sector / index aggregates
+    try:
+        apply_quote(symbol, data['change_percent'])
+    except redis.RedisError as e:
+        logger.warning(f"Aggregate update failed for {symbol}: {e}")
+
+
 def _nse_ticker(symbol: str) -> str:
     symbol = symbol.upper().strip()
     if not symbol.endswith('.NS') and not symbol.endswith('.BSE'):
@@ -47,11 +63,12 @@ def get_price(symbol: str) -> dict | None:
                 'price': round(float(price), 2),
                 'change': change,
                 'change_percent': change_pct,
-                'volume': info.three_month_average_volume,
+                # Today's volume, as the batch download reports it
+                'volume': info.last_volume,
                 'source': 'yfinance',
                 'cached': False,
             }
-            redis_client.setex(cache_key, CACHE_TTL, json.dumps(data))
+            _store_quote(symbol, data)
             return data
 
     except Exception as e:
@@ -70,7 +87,7 @@ def get_price(symbol: str) -> dict | None:
                 'source': 'finnhub',
                 'cached': False,
             }
-            redis_client.setex(cache_key, CACHE_TTL, json.dumps(data))
+            _store_quote(symbol, data)
             return data
 
     except Exception as e:
@@ -83,6 +100,110 @@ def get_multiple_prices(symbols: list[str]) -> dict:
     return {symbol: get_price(symbol) for symbol in symbols}
 
 
+async def aget_multiple_prices(symbols: list[str]) -> dict:
+    """
+    Async counterpart of get_multiple_prices for the ASGI request path.
+    Cached quotes come back in one MGET; misses fall through to the blocking
+    upstream fetch in worker threads, all concurrently.
+    """
+    symbols = [symbol.upper().strip() for symbol in symbols]
+    if not symbols:
+        return {}
+
+    cached = await async_redis_client.mget([f"price:{symbol}" for symbol in symbols])
+    prices = {}
+    misses = []
+    for symbol, raw in zip(symbols, cached):
+        if raw:
+            prices[symbol] = {**json.loads(raw), 'cached': True}
+        else:
+            misses.append(symbol)
+
+    fetch = sync_to_async(get_price, thread_sensitive=False)
+    for symbol, data in zip(misses, await asyncio.gather(*(fetch(symbol) for symbol in misses))):
+        prices[symbol] = data
+
+    return prices
+
+
+def _download_quotes(symbols: list[str]) -> dict:
+    """
+    Quotes for many symbols from one yfinance batch download: the latest daily
+    bar is today's (it tracks the live price during the session), the one
+    before it gives the previous close.
+    """
+    tickers = [_nse_ticker(symbol) for symbol in symbols]
+    try:
+        history = yf.download(
+            tickers, period='5d', interval='1d', group_by='ticker',
+            progress=False, threads=True, auto_adjust=False,
+        )
+    except Exception as e:
+        logger.warning(f"yfinance batch download failed for {len(symbols)} symbols: {e}")
+        return {}
+
+    quotes = {}
+    for symbol, ticker in zip(symbols, tickers):
+        try:
+            bars = history[ticker].dropna(subset=['Close'])
+        except KeyError:
+            continue
+        if bars.empty:
+            continue
+        price = float(bars['Close'].iloc[-1])
+        prev_close = float(bars['Close'].iloc[-2]) if len(bars) > 1 else None
+        change = round(price - prev_close, 2) if prev_close else 0
+        volume = float(bars['Volume'].iloc[-1])
+        quotes[symbol] = {
+            'symbol': symbol,
+            'price': round(price, 2),
+            'change': change,
+            'change_percent': round((change / prev_close) * 100, 2) if prev_close else 0,
+            'volume': None if math.isnan(volume) else int(volume),
+            'source': 'yfinance',
+            'cached': False,
+        }
+    return quotes
+
+
+def get_quotes(symbols: list[str]) -> dict:
+    """
+    Batched get_multiple_prices: every cached quote in one MGET, every miss in
+    one upstream batch download, and the per-symbol fallback chain only for
+    what the batch couldn't price. Missing symbols map to None.
+    """
+    symbols = list(dict.fromkeys(symbol.upper().strip() for symbol in symbols))
+    if not symbols:
+        return {}
+
+    quotes = {}
+    misses = []
+    for symbol, raw in zip(symbols, redis_client.mget([f"price:{symbol}" for symbol in symbols])):
+        if raw:
+            quotes[symbol] = {**json.loads(raw), 'cached': True}
+        else:
+            misses.append(symbol)
+
+    if misses:
+        fetched = _download_quotes(misses)
+        pipeline = redis_client.pipeline(transaction=False)
+        for symbol, data in fetched.items():
+            pipeline.setex(f"price:{symbol}", CACHE_TTL, json.dumps(data))
+        pipeline.execute()
+        for symbol, data in fetched.items():
+            try:
+                apply_quote(symbol, data['change_percent'])
+            except redis.RedisError as e:
+                logger.warning(f"Aggregate update failed for {symbol}: {e}")
+        quotes.update(fetched)
+
+        for symbol in misses:
+            if symbol not in quotes:
+                quotes[symbol] = get_price(symbol)
+
+    return {symbol: quotes.get(symbol) for symbol in symbols}
+
+
 def search_stocks(query: str) -> list:
     try:
         results = finnhub_client.symbol_lookup(query)
@@ -0,0 +1,40 @@
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+
+def sse_event(data: dict, event: str = None) -> str:
+    """Format one server-sent event frame."""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data, default=str)}\n\n"
+
+
+# A comment frame: ignored by EventSource, keeps idle proxies from closing the stream
+SSE_KEEPALIVE = ": keepalive\n\n"
+
+
+def sse_response(events) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream until it ends
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF content negotiation accept `Accept: text/event-stream` (what
+    EventSource sends). Streams bypass renderers; this only formats plain
+    Response bodies such as validation errors as a single event.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return sse_event(data, event='error').encode(self.charset)
+
+
+STREAM_RENDERER_CLASSES = [*api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer]
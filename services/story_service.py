@@ -0,0 +1,63 @@
+import json
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from services.http_cache import make_etag
+from stories.models import Story
+from stories.serializers import StorySerializer
+
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+# rotate_daily_story rewrites the entry every morning; the TTL only clears old days
+TODAY_STORY_TTL = 60 * 60 * 26
+# "No story today" is cached too, briefly, so an empty day doesn't hit Postgres per request
+MISSING_STORY_TTL = 60 * 5
+
+
+def _today_key(day) -> str:
+    return f"stories:today:{day.isoformat()}"
+
+
+def _entry(story: Story | None) -> dict:
+    if story is None:
+        return {"story": None}
+    return {
+        "story": StorySerializer(story).data,
+        "etag": make_etag(story.id, story.updated_at.isoformat()),
+        "last_modified": story.updated_at.isoformat(),
+    }
+
+
+def cache_today_story(story: Story | None, day=None) -> dict:
+    day = day or timezone.now().date()
+    entry = _entry(story)
+    ttl = TODAY_STORY_TTL if story else MISSING_STORY_TTL
+    redis_client.setex(_today_key(day), ttl, json.dumps(entry, default=str))
+    return entry
+
+
+def get_today_story(day=None) -> dict:
+    """
+    The day's serialized story with its validators:
+    {"story", "etag", "last_modified"}, or {"story": None}.
+    Read from Redis; Postgres is only queried on a cold cache.
+    """
+    day = day or timezone.now().date()
+    cached = redis_client.get(_today_key(day))
+    if cached:
+        entry = json.loads(cached)
+    else:
+        story = Story.objects.filter(display_date=day, is_active=True).first()
+        entry = cache_today_story(story, day)
+
+    if entry["story"] is not None:
+        entry["last_modified"] = parse_datetime(entry["last_modified"])
+    return entry
+
+
+def drop_today_story(day=None) -> None:
+    """Forget the cached story so the next request reloads it (after admin edits)."""
+    redis_client.delete(_today_key(day or timezone.now().date()))
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from services.story_service import drop_today_story
 from .models import Story
 
 
@@ -7,4 +8,17 @@ class StoryAdmin(admin.ModelAdmin):
     list_display = ('trader_name', 'title', 'display_date', 'is_active', 'created_at')
     list_filter = ('is_active',)
     search_fields = ('trader_name', 'title')
-    ordering = ('-created_at',)
\ No newline at end of file
+    ordering = ('-created_at',)
+
+    # Edits may touch today's story; the next request re-reads it from Postgres
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        drop_today_story()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        drop_today_story()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        drop_today_story()
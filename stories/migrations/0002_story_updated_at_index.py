@@ -0,0 +1,22 @@
+# Generated by Django 5.2.11 on 2026-10-19 11:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='story',
+            index=models.Index(fields=['is_active', '-display_date', '-id'], name='stories_active_date_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.11 on 2026-10-19 11:59
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0002_story_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('title', 'trader_name', config='english', weight='A'), '||', django.contrib.postgres.search.SearchVector('famous_quote', 'key_lesson', config='english', weight='B'), django.contrib.postgres.search.SearchConfig('english')), '||', django.contrib.postgres.search.SearchVector('content', config='english', weight='C'), django.contrib.postgres.search.SearchConfig('english')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='story',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='stories_search_idx'),
+        ),
+    ]
@@ -1,5 +1,9 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
 
+SEARCH_CONFIG = 'english'
+
 
 class Story(models.Model):
     title = models.CharField(max_length=255)
@@ -11,9 +15,26 @@ class Story(models.Model):
     is_active = models.BooleanField(default=True)
     display_date = models.DateField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Drives Last-Modified / ETag on the story endpoints
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by Postgres on every write, weighted so title / trader name
+    # matches rank above quote / lesson, and those above the body text
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('title', 'trader_name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('famous_quote', 'key_lesson', weight='B', config=SEARCH_CONFIG)
+            + SearchVector('content', weight='C', config=SEARCH_CONFIG)
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     def __str__(self):
         return f"{self.trader_name} — {self.title}"
 
     class Meta:
-        verbose_name_plural = "Stories"
\ No newline at end of file
+        verbose_name_plural = "Stories"
+        indexes = [
+            models.Index(fields=['is_active', '-display_date', '-id'], name='stories_active_date_idx'),
+            GinIndex(fields=['search_vector'], name='stories_search_idx'),
+        ]
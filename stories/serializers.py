@@ -5,4 +5,24 @@ from .models import Story
 class StorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Story
-        fields = '__all__'
\ No newline at end of file
+        exclude = ('search_vector',)
+
+
+class StoryListSerializer(serializers.ModelSerializer):
+    """List projection: everything a story card needs, without the long `content`."""
+
+    class Meta:
+        model = Story
+        fields = (
+            'id', 'title', 'trader_name', 'famous_quote', 'key_lesson',
+            'image_url', 'display_date', 'updated_at',
+        )
+
+
+class StorySearchResultSerializer(StoryListSerializer):
+    """A list card plus its search rank and a highlighted excerpt of `content`."""
+    rank = serializers.FloatField(read_only=True)
+    snippet = serializers.CharField(read_only=True)
+
+    class Meta(StoryListSerializer.Meta):
+        fields = StoryListSerializer.Meta.fields + ('rank', 'snippet')
@@ -2,6 +2,7 @@ from celery import shared_task
 from django.utils import timezone
 from datetime import timedelta
 import random
+from services.story_service import cache_today_story
 from .models import Story
 
 
@@ -22,10 +23,13 @@ def rotate_daily_story():
         candidates = Story.objects.filter(is_active=True)
 
     if not candidates.exists():
+        cache_today_story(None, today)
         return "No active stories found."
 
     story = random.choice(list(candidates))
     story.display_date = today
     story.save()
+    # Warm the cache so the morning's first app opens don't go to Postgres
+    cache_today_story(story, today)
 
     return f"Today's story set to: {story.trader_name}"
\ No newline at end of file
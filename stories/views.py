@@ -1,29 +1,94 @@
-from django.utils import timezone
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db.models import Count, F, Max
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
-from .models import Story
-from .serializers import StorySerializer
+from services.http_cache import make_etag, not_modified, set_validators
+from services.story_service import get_today_story
+from .models import SEARCH_CONFIG, Story
+from .serializers import StoryListSerializer, StorySearchResultSerializer
+
+
+class StoryPagination(LimitOffsetPagination):
+    default_limit = 20
+    max_limit = 100
+
+
+def _attach_snippets(stories: list, query: SearchQuery) -> None:
+    """
+    Highlight matches in `content` for one page of results. ts_headline is
+    costly, so it runs in its own query over just the page's ids rather than
+    over every match.
+    """
+    snippets = dict(
+        Story.objects.filter(id__in=[story.id for story in stories])
+        .annotate(snippet=SearchHeadline(
+            'content', query, config=SEARCH_CONFIG,
+            start_sel='<mark>', stop_sel='</mark>',
+            max_words=35, min_words=15, max_fragments=2,
+        ))
+        .values_list('id', 'snippet')
+    )
+    for story in stories:
+        story.snippet = snippets.get(story.id, '')
 
 
 class TodayStoryView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        today = timezone.now().date()
-        story = Story.objects.filter(display_date=today, is_active=True).first()
-        if not story:
+        # One Redis read; a client that already has today's story gets a 304
+        entry = get_today_story()
+        if entry['story'] is None:
             return Response({'detail': 'No story for today.'}, status=status.HTTP_404_NOT_FOUND)
-        return Response(StorySerializer(story).data)
+
+        unchanged = not_modified(request, entry['etag'], entry['last_modified'])
+        if unchanged is not None:
+            return unchanged
+        return set_validators(Response(entry['story']), entry['etag'], entry['last_modified'])
 
 
 class AllStoriesView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        queryset = Story.objects.filter(is_active=True).order_by('-display_date')
+        """
+        GET /api/stories/?q=&trader=&limit=&offset=
+        Paged story cards (no `content`, fetch the full story on open).
+        With `q`, a ranked full-text search over the GIN-indexed search
+        vector; each result carries its rank and a highlighted snippet.
+        """
+        queryset = Story.objects.filter(is_active=True).order_by('-display_date', '-id')
         trader = request.query_params.get('trader')
         if trader:
             queryset = queryset.filter(trader_name__icontains=trader)
-        return Response(StorySerializer(queryset, many=True).data)
\ No newline at end of file
+
+        search = request.query_params.get('q', '').strip()
+        query = None
+        if search:
+            query = SearchQuery(search, search_type='websearch', config=SEARCH_CONFIG)
+            queryset = (
+                queryset.filter(search_vector=query)
+                .annotate(rank=SearchRank(F('search_vector'), query))
+                .order_by('-rank', '-id')
+            )
+
+        # Validators from one aggregate query, so an unchanged list is a 304
+        # without loading or serializing a single story
+        state = queryset.aggregate(count=Count('id'), last_modified=Max('updated_at'))
+        etag = make_etag(state['count'], state['last_modified'], request.get_full_path())
+        unchanged = not_modified(request, etag, state['last_modified'])
+        if unchanged is not None:
+            return unchanged
+
+        paginator = StoryPagination()
+        page = paginator.paginate_queryset(queryset.only(*StoryListSerializer.Meta.fields), request, view=self)
+        if query is not None:
+            _attach_snippets(page, query)
+            data = StorySearchResultSerializer(page, many=True).data
+        else:
+            data = StoryListSerializer(page, many=True).data
+        response = paginator.get_paginated_response(data)
+        return set_validators(response, etag, state['last_modified'])
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.11 on 2026-10-19 11:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0003_transaction_order_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnrichedTrade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trade_id', models.PositiveIntegerField()),
+                ('sell_transaction_id', models.BigIntegerField()),
+                ('ticker', models.CharField(max_length=20)),
+                ('direction', models.CharField(default='LONG', max_length=5)),
+                ('entry_time', models.DateTimeField()),
+                ('exit_time', models.DateTimeField()),
+                ('entry_price', models.FloatField()),
+                ('exit_price', models.FloatField()),
+                ('quantity', models.PositiveIntegerField()),
+                ('position_size', models.FloatField()),
+                ('holding_time', models.FloatField()),
+                ('time_of_day_bucket', models.CharField(max_length=10)),
+                ('day_of_week', models.CharField(max_length=10)),
+                ('pnl', models.FloatField()),
+                ('pnl_pct', models.FloatField()),
+                ('trend', models.CharField(blank=True, max_length=10, null=True)),
+                ('volatility', models.CharField(blank=True, max_length=10, null=True)),
+                ('volume_level', models.CharField(blank=True, max_length=10, null=True)),
+                ('distance_from_ma', models.FloatField(blank=True, null=True)),
+                ('rsi_value', models.FloatField(blank=True, null=True)),
+                ('distance_from_recent_high', models.FloatField(blank=True, null=True)),
+                ('distance_from_recent_low', models.FloatField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enriched_trades', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['trade_id'],
+                'unique_together': {('user', 'trade_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TradeMatcherState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_transaction_id', models.BigIntegerField(default=0)),
+                ('next_trade_id', models.PositiveIntegerField(default=1)),
+                ('open_lots', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='trade_matcher_state', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.11 on 2026-10-19 12:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0004_enrichedtrade_tradematcherstate'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioValuePoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ts', models.DateTimeField()),
+                ('resolution', models.CharField(choices=[('5m', '5 minutes'), ('1d', 'Daily'), ('1w', 'Weekly')], default='5m', max_length=2)),
+                ('total_value', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('cash_balance', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='value_points', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['ts'],
+                'indexes': [models.Index(fields=['resolution', 'ts'], name='trading_point_res_ts_idx')],
+                'unique_together': {('user', 'ts')},
+            },
+        ),
+    ]
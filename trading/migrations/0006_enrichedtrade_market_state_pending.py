@@ -0,0 +1,25 @@
+# Generated by Django 5.2.11 on 2026-10-19 12:21
+
+from django.db import migrations, models
+
+
+def flag_missing_market_state(apps, schema_editor):
+    # Rows stored with no market state may come from a failed fetch; retry them once
+    EnrichedTrade = apps.get_model('trading', 'EnrichedTrade')
+    EnrichedTrade.objects.filter(trend__isnull=True).update(market_state_pending=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0005_portfoliovaluepoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrichedtrade',
+            name='market_state_pending',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(flag_missing_market_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0006_enrichedtrade_market_state_pending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrichedtrade',
+            name='market_state_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
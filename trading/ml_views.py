@@ -1,45 +1,116 @@
+import uuid
+
+from celery.result import AsyncResult
+from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
-from services.csv_export_service import build_trade_dataframe
-from services.ml_service import get_ml_insights
+from services.insights_service import (
+    INSUFFICIENT_DATA, claim_job, follow_progress, get_cached_insights, job_owner,
+    latest_transaction_id,
+)
+from services.sse import SSE_KEEPALIVE, STREAM_RENDERER_CLASSES, sse_event, sse_response
+from trading.tasks import generate_trade_insights
 
 
 class TradeInsightsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        df = build_trade_dataframe(request.user)
-
-        if df.empty:
-            return Response({
-                'status': 'insufficient_data',
-                'message': 'You need at least one completed trade (a buy followed by a sell) before we can analyze your trading patterns.',
-                'insights': []
-            })
-
-        # Market state columns only populate during weekday market hours
-        # market_cols = ['trend', 'volatility', 'rsi_value']
-        # missing = [c for c in market_cols if c not in df.columns or df[c].isnull().all()]
-
-        # if missing:
-        #     return Response({
-        #         'status': 'insufficient_market_data',
-        #         'message': 'Market state data is only available for trades made during NSE market hours on weekdays. Please make trades during 9:15 AM - 3:30 PM IST for full analysis.',
-        #         'trades_found': len(df)
-        #     })
-
-        try:
-            report, analytics = get_ml_insights(df)
-            return Response({
-                'status': 'ok',
-                'total_completed_trades': len(df),
-                'analytics': analytics,
-                'report': report,
-            })
-        except Exception as e:
-            return Response({
-                'status': 'error',
-                'message': str(e)
-            }, status=500)
\ No newline at end of file
+        """
+        GET /api/trading/insights/
+        Returns cached insights if nothing was traded since they were computed,
+        otherwise queues a job and answers 202 with its id.
+        """
+        latest_txn_id = latest_transaction_id(request.user)
+        if latest_txn_id is None:
+            return Response(INSUFFICIENT_DATA)
+
+        cached = get_cached_insights(request.user.id, latest_txn_id)
+        if cached:
+            return Response(cached)
+
+        job_id, created = claim_job(request.user.id, latest_txn_id, str(uuid.uuid4()))
+        if created:
+            generate_trade_insights.apply_async(
+                args=[request.user.id, latest_txn_id], task_id=job_id
+            )
+
+        return Response({
+            'status': 'processing',
+            'job_id': job_id,
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class TradeInsightsJobView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        """GET /api/trading/insights/jobs/<job_id>/"""
+        if job_owner(job_id) != request.user.id:
+            return Response({'error': 'Job not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        result = AsyncResult(job_id)
+        if result.successful():
+            payload = result.result
+            return Response(payload, status=500 if payload.get('status') == 'error' else 200)
+        if result.failed():
+            return Response({'status': 'error', 'message': str(result.result)}, status=500)
+
+        return Response({
+            'status': 'processing',
+            'job_id': job_id,
+            'state': result.state,
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+
+STREAM_KEEPALIVE_SECONDS = 15
+
+
+async def _cached_events(payload: dict):
+    if payload.get('analytics') is not None:
+        yield sse_event(payload['analytics'], event='analytics')
+    if payload.get('report'):
+        yield sse_event({'token': payload['report']})
+    yield sse_event(payload, event='done')
+
+
+async def _job_events(user_id: int, txn_id: int):
+    async for event, data in follow_progress(user_id, txn_id, STREAM_KEEPALIVE_SECONDS):
+        if event is None:
+            yield SSE_KEEPALIVE
+        elif event == 'token':
+            yield sse_event(data)
+        else:
+            yield sse_event(data, event=event)
+
+
+class TradeInsightsStreamView(APIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = STREAM_RENDERER_CLASSES
+
+    def get(self, request):
+        """
+        GET /api/trading/insights/stream/
+        Server-sent events: an `analytics` frame, `data: {"token": ...}` frames
+        as the report is generated, then `event: done`.
+        The work runs in the same Celery job as /insights/ (claimed the same
+        way, so concurrent requests share one computation); this view only
+        relays the job's progress.
+        """
+        user_id = request.user.id
+        latest_txn_id = latest_transaction_id(request.user)
+        if latest_txn_id is None:
+            return sse_response(_cached_events(INSUFFICIENT_DATA))
+
+        cached = get_cached_insights(user_id, latest_txn_id)
+        if cached:
+            return sse_response(_cached_events(cached))
+
+        job_id, created = claim_job(user_id, latest_txn_id, str(uuid.uuid4()))
+        if created:
+            generate_trade_insights.apply_async(args=[user_id, latest_txn_id], task_id=job_id)
+
+        return sse_response(_job_events(user_id, latest_txn_id))
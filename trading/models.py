@@ -19,6 +19,9 @@ class Transaction(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['user', '-timestamp', '-id'], name='trading_txn_user_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} | {self.action} {self.quantity} {self.ticker} @ {self.price_at_execution}"
@@ -42,6 +45,9 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'status', '-created_at', '-id'], name='trading_order_user_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} | {self.order_type} {self.quantity} {self.ticker} @ {self.target_price} [{self.status}]"
@@ -73,4 +79,82 @@ class PortfolioSnapshot(models.Model):
         ordering = ['date']
 
     def __str__(self):
-        return f"{self.user.username} | {self.date} | ₹{self.total_value}"
\ No newline at end of file
+        return f"{self.user.username} | {self.date} | ₹{self.total_value}"
+
+
+class PortfolioValuePoint(models.Model):
+    """
+    One point of a user's equity curve. Points start at 5-minute resolution
+    during market hours; compact_portfolio_points folds them into one point
+    per day, then per week, as they age. invested value = total - cash.
+    """
+    RESOLUTION_CHOICES = [('5m', '5 minutes'), ('1d', 'Daily'), ('1w', 'Weekly')]
+
+    # The (user, ts) unique index covers lookups by user
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='value_points', db_index=False
+    )
+    ts = models.DateTimeField()
+    resolution = models.CharField(max_length=2, choices=RESOLUTION_CHOICES, default='5m')
+    total_value = models.DecimalField(max_digits=15, decimal_places=2)
+    cash_balance = models.DecimalField(max_digits=15, decimal_places=2)
+
+    class Meta:
+        unique_together = ('user', 'ts')
+        ordering = ['ts']
+        indexes = [
+            models.Index(fields=['resolution', 'ts'], name='trading_point_res_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} | {self.ts:%Y-%m-%d %H:%M} [{self.resolution}] | ₹{self.total_value}"
+
+
+class EnrichedTrade(models.Model):
+    """A completed (lot, sell) trade with its market features, as fed to the insights engine."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='enriched_trades')
+    trade_id = models.PositiveIntegerField()
+    sell_transaction_id = models.BigIntegerField()
+    ticker = models.CharField(max_length=20)
+    direction = models.CharField(max_length=5, default='LONG')
+    entry_time = models.DateTimeField()
+    exit_time = models.DateTimeField()
+    entry_price = models.FloatField()
+    exit_price = models.FloatField()
+    quantity = models.PositiveIntegerField()
+    position_size = models.FloatField()
+    holding_time = models.FloatField()
+    time_of_day_bucket = models.CharField(max_length=10)
+    day_of_week = models.CharField(max_length=10)
+    pnl = models.FloatField()
+    pnl_pct = models.FloatField()
+    trend = models.CharField(max_length=10, null=True, blank=True)
+    volatility = models.CharField(max_length=10, null=True, blank=True)
+    volume_level = models.CharField(max_length=10, null=True, blank=True)
+    distance_from_ma = models.FloatField(null=True, blank=True)
+    rsi_value = models.FloatField(null=True, blank=True)
+    distance_from_recent_high = models.FloatField(null=True, blank=True)
+    distance_from_recent_low = models.FloatField(null=True, blank=True)
+    # Set when the market history fetch failed; later syncs retry these rows
+    market_state_pending = models.BooleanField(default=False)
+    # Failed fetches so far; retries stop at MAX_MARKET_STATE_ATTEMPTS
+    market_state_attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'trade_id')
+        ordering = ['trade_id']
+
+    def __str__(self):
+        return f"{self.user} | #{self.trade_id} {self.ticker} × {self.quantity} | pnl {self.pnl}"
+
+
+class TradeMatcherState(models.Model):
+    """Where the incremental trade matcher stopped for a user, and the lots still open."""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='trade_matcher_state')
+    last_transaction_id = models.BigIntegerField(default=0)
+    next_trade_id = models.PositiveIntegerField(default=1)
+    open_lots = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user} | up to txn {self.last_transaction_id}"
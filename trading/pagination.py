@@ -0,0 +1,82 @@
+import base64
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+from market.utils import IST
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(moment: datetime, pk: int) -> str:
+    raw = f"{moment.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        moment, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        return datetime.fromisoformat(moment), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor('Invalid cursor.') from e
+
+
+def page_size(request) -> int:
+    try:
+        limit = int(request.query_params.get('limit', DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def date_param(request, name: str):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(f"{name} must be a date in YYYY-MM-DD format")
+    return parsed
+
+
+def day_bounds(date_from: date | None, date_to: date | None) -> tuple:
+    """
+    Aware [start, end) datetimes covering the given IST days, the days users
+    and the market keep. Filtering on these instead of `__date` keeps the
+    column bare, so a timestamp index can serve the range.
+    """
+    start = datetime.combine(date_from, time.min, tzinfo=IST) if date_from else None
+    end = datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=IST) if date_to else None
+    return start, end
+
+
+def keyset_page(queryset, time_field: str, cursor: str | None, limit: int) -> tuple:
+    """
+    Newest-first keyset page over (time_field, id).
+    Seeks past the cursor row instead of using OFFSET, so every page costs the
+    same index range scan no matter how deep the client has paged.
+    Returns (rows, next_cursor).
+    """
+    queryset = queryset.order_by(f'-{time_field}', '-id')
+
+    if cursor:
+        moment, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f'{time_field}__lt': moment}) | Q(**{time_field: moment, 'id__lt': pk})
+        )
+
+    rows = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, time_field), last.id)
+
+    return rows, next_cursor
@@ -1,21 +1,29 @@
 from celery import shared_task
 from decimal import Decimal
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.functions import TruncDay, TruncWeek
 from django.utils import timezone
-from django.conf import settings
 import datetime
-import redis
-
-from market.utils import is_market_open
-from services.price_service import get_price, get_multiple_prices
+import json
+
+from market.utils import IST, is_market_open
+from services.insights_service import compute_insights, publish_progress, release_job, store_insights
+from services.leaderboard_service import (
+    LEADERBOARD_KEY, LEADERBOARD_META_KEY, WINDOW_TTLS,
+    board_key, redis_client, window_start,
+)
+from services.pnl_history_service import invalidate_pnl_history
+from services.price_service import get_price, get_multiple_prices, get_quotes
 from services.trade_service import execute_buy, execute_sell
-from trading.models import Order, PortfolioSnapshot
+from trading.models import Order, PortfolioSnapshot, PortfolioValuePoint
 
 User = get_user_model()
 
-redis_client = redis.Redis.from_url(settings.CELERY_BROKER_URL, decode_responses=True)
-LEADERBOARD_KEY = "leaderboard:returns"
 STARTING_BALANCE = Decimal("100000.00")
+INTRADAY_INTERVAL_MINUTES = 5
+POINT_BATCH_SIZE = 1000
 
 
 @shared_task
@@ -61,26 +69,47 @@ def process_pending_orders():
     return f"Processed {len(pending_orders)} orders. Executed: {executed}, Failed: {failed}"
 
 
+def _portfolio_values(users, skip_unpriced=False):
+    """
+    Yield (user, cash_balance, invested_value) for each user, pricing every
+    held ticker across all users in one batched quote lookup. With
+    skip_unpriced, users holding a ticker without a quote are left out rather
+    than valued as if it were worth nothing.
+    """
+    users = list(users)
+    tickers = {p.ticker for user in users for p in user.positions.all()}
+    prices = {
+        ticker: Decimal(str(quote['price']))
+        for ticker, quote in get_quotes(list(tickers)).items()
+        if quote and quote.get('price')
+    }
+
+    for user in users:
+        positions = list(user.positions.all())
+        if skip_unpriced and any(p.ticker not in prices for p in positions):
+            continue
+        invested_value = sum(
+            (prices.get(p.ticker, Decimal("0.00")) * p.quantity for p in positions),
+            Decimal("0.00"),
+        )
+        try:
+            cash_balance = user.wallet.balance
+        except User.wallet.RelatedObjectDoesNotExist:
+            print(f"Valuation skipped for {user.username}: no wallet")
+            continue
+        yield user, cash_balance, invested_value
+
+
 @shared_task
 def take_portfolio_snapshots():
     today = timezone.localdate()
     yesterday = today - datetime.timedelta(days=1)
 
-    users = User.objects.prefetch_related('portfolioposition_set', 'wallet').all()
+    users = User.objects.prefetch_related('positions', 'wallet').all()
+    snapshotted = []
 
-    for user in users:
+    for user, cash_balance, invested_value in _portfolio_values(users):
         try:
-            positions = list(user.portfolioposition_set.all())
-
-            invested_value = Decimal("0.00")
-            if positions:
-                tickers = [p.ticker for p in positions]
-                prices = get_multiple_prices(tickers)
-                for position in positions:
-                    price = Decimal(str(prices.get(position.ticker, 0)))
-                    invested_value += price * position.quantity
-
-            cash_balance = user.wallet.balance
             total_value = cash_balance + invested_value
 
             daily_pnl = Decimal("0.00")
@@ -100,24 +129,121 @@ def take_portfolio_snapshots():
                     'daily_pnl': daily_pnl,
                 }
             )
+            snapshotted.append(user.id)
 
         except Exception as e:
             print(f"Snapshot failed for {user.username}: {e}")
 
+    invalidate_pnl_history(snapshotted)
     return f"Snapshots taken for {users.count()} users"
 
 
+@shared_task
+def take_intraday_snapshots():
+    """
+    Record every user's portfolio value as one 5-minute equity curve point,
+    written in bulk. Re-running within the same interval is a no-op.
+    """
+    if not is_market_open():
+        return "Market closed. Skipping intraday snapshots."
+
+    now = timezone.now().replace(second=0, microsecond=0)
+    ts = now - datetime.timedelta(minutes=now.minute % INTRADAY_INTERVAL_MINUTES)
+
+    users = User.objects.prefetch_related('positions', 'wallet').all()
+    points = [
+        PortfolioValuePoint(
+            user=user, ts=ts, resolution='5m',
+            total_value=cash_balance + invested_value, cash_balance=cash_balance,
+        )
+        for user, cash_balance, invested_value in _portfolio_values(users, skip_unpriced=True)
+    ]
+    PortfolioValuePoint.objects.bulk_create(points, batch_size=POINT_BATCH_SIZE, ignore_conflicts=True)
+    return f"Intraday points taken for {len(points)} users"
+
+
+def _ist_midnight(day: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(day, datetime.time.min, tzinfo=IST)
+
+
+def _compact(source: str, target: str, bucket, cutoff: datetime.datetime) -> int:
+    """
+    Replace every `source` point before `cutoff` with one `target` point per
+    user and bucket, carrying the bucket's last value. Cutoffs fall on bucket
+    boundaries, so a bucket is always compacted in one go.
+    """
+    stale = PortfolioValuePoint.objects.filter(resolution=source, ts__lt=cutoff)
+    with transaction.atomic():
+        closes = list(
+            stale.annotate(bucket=bucket)
+            .order_by('user_id', 'bucket', '-ts')
+            .distinct('user_id', 'bucket')
+            .values_list('user_id', 'bucket', 'total_value', 'cash_balance')
+        )
+        stale.delete()
+        PortfolioValuePoint.objects.bulk_create(
+            [
+                PortfolioValuePoint(
+                    user_id=user_id, ts=ts, resolution=target,
+                    total_value=total_value, cash_balance=cash_balance,
+                )
+                for user_id, ts, total_value, cash_balance in closes
+            ],
+            batch_size=POINT_BATCH_SIZE,
+        )
+    return len(closes)
+
+
+@shared_task
+def compact_portfolio_points():
+    """
+    Tiered retention for the equity curve: 5-minute points older than
+    PORTFOLIO_INTRADAY_RETENTION_DAYS become daily closes, daily points older
+    than PORTFOLIO_DAILY_RETENTION_DAYS become weekly closes. Keeps each user
+    at a bounded number of rows however long they have been trading.
+    """
+    today = timezone.localdate(timezone=IST)
+    intraday_cutoff = _ist_midnight(today - datetime.timedelta(days=settings.PORTFOLIO_INTRADAY_RETENTION_DAYS))
+    daily_before = today - datetime.timedelta(days=settings.PORTFOLIO_DAILY_RETENTION_DAYS)
+    daily_cutoff = _ist_midnight(daily_before - datetime.timedelta(days=daily_before.weekday()))
+
+    daily = _compact('5m', '1d', TruncDay('ts', tzinfo=IST), intraday_cutoff)
+    weekly = _compact('1d', '1w', TruncWeek('ts', tzinfo=IST), daily_cutoff)
+    return f"Compacted into {daily} daily and {weekly} weekly points"
+
+
+def _window_baselines(start_date) -> dict:
+    """
+    Portfolio value each user carried into a window: the latest snapshot taken
+    before the window started. Users without one are measured from STARTING_BALANCE.
+    """
+    snapshots = PortfolioSnapshot.objects.filter(
+        date__lt=start_date
+    ).order_by('user_id', '-date').distinct('user_id').values_list('user_id', 'total_value')
+    return dict(snapshots)
+
+
+def _return_pct(total_value: Decimal, baseline: Decimal) -> float:
+    if not baseline:
+        return 0.0
+    return float(((total_value - baseline) / baseline) * 100)
+
+
 @shared_task
 def update_leaderboard():
     if not is_market_open():
         return "Market closed. Skipping leaderboard update."
 
-    users = User.objects.prefetch_related('portfolioposition_set', 'wallet').all()
+    users = User.objects.prefetch_related('positions', 'wallet').all()
     pipeline = redis_client.pipeline()
 
+    windows = {window: board_key(window) for window in WINDOW_TTLS}
+    baselines = {window: _window_baselines(window_start(window)) for window in WINDOW_TTLS}
+    updated_at = timezone.now().isoformat()
+
     for user in users:
         try:
-            positions = list(user.portfolioposition_set.all())
+            positions = list(user.positions.all())
 
             invested_value = Decimal("0.00")
             if positions:
@@ -128,12 +254,46 @@ def update_leaderboard():
                     invested_value += price * position.quantity
 
             total_value = user.wallet.balance + invested_value
-            return_pct = float(((total_value - STARTING_BALANCE) / STARTING_BALANCE) * 100)
+            return_pct = _return_pct(total_value, STARTING_BALANCE)
 
             pipeline.zadd(LEADERBOARD_KEY, {user.username: return_pct})
+            for window, key in windows.items():
+                baseline = baselines[window].get(user.id, STARTING_BALANCE)
+                pipeline.zadd(key, {user.username: _return_pct(total_value, baseline)})
+            pipeline.hset(LEADERBOARD_META_KEY, user.username, json.dumps({
+                "total_value": float(total_value),
+                "holdings": len(positions),
+                "updated_at": updated_at,
+            }))
 
         except Exception as e:
             print(f"Leaderboard update failed for {user.username}: {e}")
 
+    for window, key in windows.items():
+        pipeline.expire(key, WINDOW_TTLS[window])
     pipeline.execute()
-    return f"Leaderboard updated for {users.count()} users"
\ No newline at end of file
+    return f"Leaderboard updated for {users.count()} users"
+
+
+@shared_task
+def generate_trade_insights(user_id, latest_txn_id):
+    """
+    Compute a user's trade insights off the request path and cache them
+    against the transaction they were computed from. Progress is published
+    as it happens for the streaming endpoint to relay.
+    """
+    try:
+        user = User.objects.get(id=user_id)
+        payload = compute_insights(user, latest_txn_id)
+        # Stored before the job is released, so no request sees neither
+        store_insights(user_id, latest_txn_id, payload)
+    except Exception as e:
+        print(f"Insights failed for user {user_id}: {e}")
+        error = {'status': 'error', 'message': str(e)}
+        publish_progress(user_id, latest_txn_id, 'error', error)
+        return error
+    finally:
+        release_job(user_id, latest_txn_id)
+
+    publish_progress(user_id, latest_txn_id, 'done', payload)
+    return payload
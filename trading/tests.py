@@ -1,3 +1,284 @@
+import datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import redis.asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from market.utils import IST
+from services import insights_service, leaderboard_service
+from services.csv_export_service import MAX_MARKET_STATE_ATTEMPTS, _compute_market_features, sync_enriched_trades
+from services.insights_service import claim_job, follow_progress, get_cached_insights
+from services.leaderboard_service import board_key, get_leaderboard_page, get_rank_around, window_start
+from services.pnl_history_service import invalidate_pnl_history, redis_client as pnl_redis
+from trading.models import EnrichedTrade, PortfolioSnapshot, Transaction
+from trading.tasks import generate_trade_insights
+from users.models import User
+
+
+class InsightsJobRetryTests(TestCase):
+    txn_id = 1
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='insights-retry', password='pw12345!')
+        self.keys = [
+            insights_service._job_key(self.user.id, self.txn_id),
+            insights_service._progress_key(self.user.id, self.txn_id),
+            insights_service._result_key(self.user.id, self.txn_id),
+        ]
+        insights_service.redis_client.delete(*self.keys)
+
+    def tearDown(self):
+        insights_service.redis_client.delete(*self.keys)
+
+    async def _run_job(self, job_id, **compute):
+        self.keys.append(insights_service._owner_key(job_id))
+        _, created = await sync_to_async(claim_job)(self.user.id, self.txn_id, job_id)
+        self.assertTrue(created)
+        with patch('trading.tasks.compute_insights', **compute):
+            await sync_to_async(generate_trade_insights)(self.user.id, self.txn_id)
+        return [event async for event, _ in follow_progress(self.user.id, self.txn_id, idle_seconds=1, timeout=5)]
+
+    async def test_retry_after_failed_job_follows_the_new_job(self):
+        # One client per test: the module's client is bound to the first event loop it ran on
+        client = redis.asyncio.Redis.from_url(settings.CELERY_BROKER_URL, decode_responses=True)
+        with patch.object(insights_service, 'async_redis_client', client):
+            failed = await self._run_job('insights-failed', side_effect=RuntimeError('upstream down'))
+            retried = await self._run_job('insights-retry', return_value={'status': 'ok', 'report': 'fine'})
+        await client.aclose()
+
+        self.assertEqual(failed, ['error'])
+        self.assertEqual(retried, ['done'])
+        cached = await sync_to_async(get_cached_insights)(self.user.id, self.txn_id)
+        self.assertEqual(cached['report'], 'fine')
+
+
+class PnlHistoryTests(TestCase):
+    days = 100
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='pnl-history', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        start = datetime.date(2024, 1, 1)
+        PortfolioSnapshot.objects.bulk_create(
+            PortfolioSnapshot(
+                user=self.user,
+                date=start + datetime.timedelta(days=i),
+                total_value=Decimal(100000 + i * 10),
+                cash_balance=Decimal('50000.00'),
+                invested_value=Decimal(50000 + i * 10),
+                daily_pnl=Decimal('10.00'),
+            )
+            for i in range(self.days)
+        )
+        self._clear_cache()
+
+    def tearDown(self):
+        self._clear_cache()
+
+    def _clear_cache(self):
+        keys = list(pnl_redis.scan_iter(f"pnl:{self.user.id}:*"))
+        if keys:
+            pnl_redis.delete(*keys)
+
+    def test_without_parameters_keeps_the_original_daily_list(self):
+        response = self.client.get('/api/trading/pnl-history/')
+
+        rows = response.json()
+        self.assertIsInstance(rows, list)
+        self.assertEqual(len(rows), self.days)
+        self.assertEqual(rows[0], {
+            'date': '2024-01-01', 'total_value': '100000.00', 'cash_balance': '50000.00',
+            'invested_value': '50000.00', 'daily_pnl': '10.00',
+        })
+
+    def test_weekly_rollup_keeps_the_total_pnl(self):
+        body = self.client.get('/api/trading/pnl-history/', {'resolution': 'weekly'}).json()
+
+        self.assertEqual(body['resolution'], 'weekly')
+        self.assertEqual(len(body['results']), 15)
+        self.assertAlmostEqual(sum(row['pnl'] for row in body['results']), 10.0 * self.days)
+        # Each week closes on its last snapshot
+        self.assertEqual(body['results'][0]['date'], '2024-01-07')
+
+    def test_lttb_returns_the_requested_points_and_keeps_the_total_pnl(self):
+        body = self.client.get('/api/trading/pnl-history/', {'points': 20}).json()
+
+        self.assertEqual(body['resolution'], 'lttb')
+        self.assertEqual(len(body['results']), 20)
+        self.assertEqual(body['results'][0]['date'], '2024-01-01')
+        self.assertEqual(body['results'][-1]['date'], '2024-04-09')
+        self.assertAlmostEqual(sum(row['pnl'] for row in body['results']), 10.0 * self.days)
+
+    def test_unknown_resolution_is_rejected(self):
+        self.assertEqual(self.client.get('/api/trading/pnl-history/', {'resolution': 'hourly'}).status_code, 400)
+
+    def test_etag_revalidates_until_the_next_snapshot(self):
+        first = self.client.get('/api/trading/pnl-history/', {'resolution': 'daily'})
+        etag = first['ETag']
+
+        cached = self.client.get('/api/trading/pnl-history/', {'resolution': 'daily'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+
+        invalidate_pnl_history([self.user.id])
+        fresh = self.client.get('/api/trading/pnl-history/', {'resolution': 'daily'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], etag)
+
+
+def _history(start, end, skip=()):
+    """Daily bars with a steady rise, minus the dates in `skip`."""
+    index = pd.bdate_range(start, end).difference(pd.DatetimeIndex(skip))
+    closes = pd.Series(np.arange(100.0, 100.0 + len(index)), index=index)
+    return pd.DataFrame({
+        'Open': closes, 'High': closes + 1, 'Low': closes - 1, 'Close': closes, 'Volume': 1000.0,
+    })
+
+
+class EnrichedTradeSyncTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='enriched-trades', password='pw12345!')
+        for action, day in (('BUY', 1), ('SELL', 5)):
+            txn = Transaction.objects.create(
+                user=self.user, ticker='TCS', action=action, quantity=10,
+                price_at_execution=Decimal('100.00'), brokerage=Decimal('0.00'), total_value=Decimal('1000.00'),
+            )
+            Transaction.objects.filter(id=txn.id).update(
+                timestamp=datetime.datetime(2024, 3, day, 10, tzinfo=datetime.timezone.utc)
+            )
+
+    def test_trade_gets_the_state_of_the_last_bar_on_or_before_entry(self):
+        # No bar on the entry day (2024-03-01), so the trade takes 2024-02-29's
+        history = _history('2024-01-01', '2024-03-06', skip=['2024-03-01'])
+        with patch('services.csv_export_service._fetch_history', return_value=history):
+            self.assertEqual(sync_enriched_trades(self.user), 1)
+
+        trade = EnrichedTrade.objects.get(user=self.user)
+        expected = _compute_market_features(history).set_index('market_date').loc['2024-02-29']
+        self.assertEqual(trade.trend, 'UP')
+        self.assertAlmostEqual(trade.distance_from_ma, expected['distance_from_ma'])
+        self.assertAlmostEqual(trade.rsi_value, expected['rsi_value'])
+        self.assertFalse(trade.market_state_pending)
+
+    def test_failed_fetch_is_retried_on_later_syncs(self):
+        with patch('services.csv_export_service._fetch_history', return_value=pd.DataFrame()):
+            sync_enriched_trades(self.user)
+        trade = EnrichedTrade.objects.get(user=self.user)
+        self.assertTrue(trade.market_state_pending)
+        self.assertEqual(trade.market_state_attempts, 1)
+
+        with patch('services.csv_export_service._fetch_history', return_value=_history('2024-01-01', '2024-03-06')):
+            sync_enriched_trades(self.user)
+        trade.refresh_from_db()
+        self.assertFalse(trade.market_state_pending)
+        self.assertEqual(trade.trend, 'UP')
+
+    def test_missing_history_stops_being_retried(self):
+        with patch('services.csv_export_service._fetch_history', return_value=pd.DataFrame()) as fetch:
+            for _ in range(MAX_MARKET_STATE_ATTEMPTS + 2):
+                sync_enriched_trades(self.user)
+
+        self.assertEqual(fetch.call_count, MAX_MARKET_STATE_ATTEMPTS)
+        trade = EnrichedTrade.objects.get(user=self.user)
+        self.assertFalse(trade.market_state_pending)
+        self.assertEqual(trade.market_state_attempts, MAX_MARKET_STATE_ATTEMPTS)
+        self.assertIsNone(trade.trend)
+
+
+class TransactionHistoryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='txn-history', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _transaction(self, moment, ticker='TCS'):
+        txn = Transaction.objects.create(
+            user=self.user, ticker=ticker, action='BUY', quantity=1,
+            price_at_execution=Decimal('100.00'), brokerage=Decimal('0.00'), total_value=Decimal('100.00'),
+        )
+        Transaction.objects.filter(id=txn.id).update(timestamp=moment)
+        return txn.id
+
+    def test_keyset_pages_cover_every_row_once_including_ties(self):
+        moment = datetime.datetime(2024, 3, 1, 10, tzinfo=IST)
+        ids = [self._transaction(moment + datetime.timedelta(minutes=i // 2)) for i in range(7)]
+
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+            body = self.client.get('/api/trading/history/', params).json()
+            seen += [row['id'] for row in body['results']]
+            cursor = body['next_cursor']
+            if cursor is None:
+                break
+
+        expected = sorted(ids, key=lambda pk: (Transaction.objects.get(id=pk).timestamp, pk), reverse=True)
+        self.assertEqual(seen, expected)
+
+    def test_date_filters_follow_ist_days(self):
+        early = self._transaction(datetime.datetime(2024, 3, 1, 2, 0, tzinfo=IST))
+        late = self._transaction(datetime.datetime(2024, 3, 1, 23, 30, tzinfo=IST))
+        self._transaction(datetime.datetime(2024, 3, 2, 0, 30, tzinfo=IST))
+        self._transaction(datetime.datetime(2024, 2, 29, 23, 30, tzinfo=IST))
+
+        body = self.client.get('/api/trading/history/', {'from': '2024-03-01', 'to': '2024-03-01'}).json()
+
+        self.assertEqual([row['id'] for row in body['results']], [late, early])
+
+    def test_invalid_cursor_is_rejected(self):
+        self.assertEqual(self.client.get('/api/trading/history/', {'cursor': 'garbage'}).status_code, 400)
+
+
+class LeaderboardTests(TestCase):
+    board = 'leaderboard:test'
+    meta = 'leaderboard:test:meta'
+
+    def setUp(self):
+        self.redis = leaderboard_service.redis_client
+        self.redis.delete(self.board, self.meta)
+        for name, key in (('LEADERBOARD_KEY', self.board), ('LEADERBOARD_META_KEY', self.meta)):
+            target = patch.object(leaderboard_service, name, key)
+            target.start()
+            self.addCleanup(target.stop)
+        # trader0 has the best return, trader9 the worst
+        self.redis.zadd(self.board, {f'trader{i}': 10.0 - i for i in range(10)})
+        self.redis.hset(self.meta, 'trader0', '{"holdings": 3}')
+
+    def tearDown(self):
+        self.redis.delete(self.board, self.meta)
+
+    def test_pages_walk_the_board_in_rank_order(self):
+        first = get_leaderboard_page(cursor=0, limit=4)
+        last = get_leaderboard_page(cursor=8, limit=4)
+
+        self.assertEqual([row['rank'] for row in first['results']], [1, 2, 3, 4])
+        self.assertEqual(first['results'][0], {'rank': 1, 'username': 'trader0', 'return_pct': 10.0, 'holdings': 3})
+        self.assertEqual(first['next_cursor'], 4)
+        self.assertEqual([row['username'] for row in last['results']], ['trader8', 'trader9'])
+        self.assertIsNone(last['next_cursor'])
+        self.assertEqual(last['total'], 10)
+
+    def test_rank_around_returns_the_neighbours(self):
+        around = get_rank_around('trader5', radius=2)
+
+        self.assertEqual(around['rank'], 6)
+        self.assertEqual([row['rank'] for row in around['results']], [4, 5, 6, 7, 8])
+        self.assertEqual(get_rank_around('trader0', radius=2)['results'][0]['rank'], 1)
+        self.assertIsNone(get_rank_around('nobody')['rank'])
+
+    def test_windowed_boards_roll_over_with_the_ist_period(self):
+        wednesday, next_monday = datetime.date(2024, 3, 6), datetime.date(2024, 3, 11)
 
-# Create your tests here.
+        self.assertEqual(window_start('weekly', wednesday), datetime.date(2024, 3, 4))
+        self.assertEqual(window_start('monthly', wednesday), datetime.date(2024, 3, 1))
+        self.assertEqual(board_key('weekly', wednesday), f'{self.board}:weekly:2024-W10')
+        self.assertNotEqual(board_key('weekly', wednesday), board_key('weekly', next_monday))
+        self.assertEqual(board_key('all', wednesday), self.board)
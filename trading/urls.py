@@ -1,9 +1,9 @@
 from django.urls import path
-from trading.ml_views import TradeInsightsView
+from trading.ml_views import TradeInsightsView, TradeInsightsJobView, TradeInsightsStreamView
 from trading.views import (
     BuyView, SellView, PlaceOrderView, CancelOrderView,
-    PortfolioView, TransactionHistoryView, PendingOrdersView,PnlHistoryView,
-    LeaderboardView,
+    PortfolioView, TransactionHistoryView, PendingOrdersView,PnlHistoryView, EquityCurveView,
+    LeaderboardView, LeaderboardRankView, ExportView,
 )
 
 urlpatterns = [
@@ -14,7 +14,12 @@ urlpatterns = [
     path('portfolio/', PortfolioView.as_view(), name='portfolio'),
     path('history/', TransactionHistoryView.as_view(), name='transaction-history'),
     path('orders/', PendingOrdersView.as_view(), name='pending-orders'),
+    path('export/<str:dataset>/', ExportView.as_view(), name='export'),
     path('pnl-history/', PnlHistoryView.as_view()),
+    path('equity-curve/', EquityCurveView.as_view(), name='equity-curve'),
     path('leaderboard/', LeaderboardView.as_view()),
+    path('leaderboard/me/', LeaderboardRankView.as_view(), name='leaderboard-rank'),
     path('insights/', TradeInsightsView.as_view(), name='trade-insights'),
+    path('insights/stream/', TradeInsightsStreamView.as_view(), name='trade-insights-stream'),
+    path('insights/jobs/<str:job_id>/', TradeInsightsJobView.as_view(), name='trade-insights-job'),
 ]
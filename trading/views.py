@@ -1,18 +1,23 @@
+import datetime
 from decimal import Decimal
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-import redis
-from django.conf import settings as django_settings
-from trading.models import PortfolioSnapshot
-
-redis_client = redis.Redis.from_url(django_settings.CELERY_BROKER_URL, decode_responses=True)
-LEADERBOARD_KEY = "leaderboard:returns"
 
+from services.http_cache import not_modified, set_validators
+from market.utils import IST
+from services.leaderboard_service import WINDOWS, DEFAULT_PAGE_SIZE, get_leaderboard_page, get_rank_around
+from services.csv_export_service import EXPORT_DATASETS, EXPORT_FORMATS, stream_export
+from services.pnl_history_service import (
+    DEFAULT_POINTS, MAX_POINTS, MIN_POINTS, RESOLUTIONS, get_pnl_history,
+)
 from services.price_service import get_price
 from services.trade_service import execute_buy, execute_sell
-from trading.models import Transaction, Order, PortfolioPosition
+from trading.models import Transaction, Order, PortfolioPosition, PortfolioValuePoint
+from trading.pagination import date_param, day_bounds, keyset_page, page_size
 from trading.serializers import (
     BuySerializer, SellSerializer, OrderSerializer,
     TransactionSerializer
@@ -156,45 +161,183 @@ class TransactionHistoryView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        """GET /api/trading/history/?cursor=&limit=50&ticker=TCS&action=BUY&from=2026-01-01&to=2026-03-31"""
         transactions = Transaction.objects.filter(user=request.user)
-        serializer = TransactionSerializer(transactions, many=True)
-        return Response(serializer.data)
+
+        try:
+            limit = page_size(request)
+            start, end = day_bounds(date_param(request, 'from'), date_param(request, 'to'))
+
+            if ticker := request.query_params.get('ticker'):
+                transactions = transactions.filter(ticker=ticker.upper().strip())
+            if action := request.query_params.get('action'):
+                transactions = transactions.filter(action=action.upper().strip())
+            if start:
+                transactions = transactions.filter(timestamp__gte=start)
+            if end:
+                transactions = transactions.filter(timestamp__lt=end)
+
+            rows, next_cursor = keyset_page(
+                transactions, 'timestamp', request.query_params.get('cursor'), limit
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'results': TransactionSerializer(rows, many=True).data,
+            'next_cursor': next_cursor,
+        })
 
 
 class PendingOrdersView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        """GET /api/trading/orders/?cursor=&limit=50&ticker=TCS"""
         orders = Order.objects.filter(user=request.user, status='PENDING')
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+
+        try:
+            limit = page_size(request)
+            if ticker := request.query_params.get('ticker'):
+                orders = orders.filter(ticker=ticker.upper().strip())
+
+            rows, next_cursor = keyset_page(
+                orders, 'created_at', request.query_params.get('cursor'), limit
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'results': OrderSerializer(rows, many=True).data,
+            'next_cursor': next_cursor,
+        })
+
+
+class ExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    CONTENT_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+    def get(self, request, dataset):
+        """GET /api/trading/export/<transactions|snapshots>/?output=csv|ndjson"""
+        output = request.query_params.get('output', 'csv').lower()
+        if dataset not in EXPORT_DATASETS or output not in EXPORT_FORMATS:
+            return Response(
+                {'error': f"Supported datasets: {', '.join(EXPORT_DATASETS)}; outputs: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        response = StreamingHttpResponse(
+            stream_export(request.user, dataset, output),
+            content_type=self.CONTENT_TYPES[output],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{dataset}_{request.user.username}.{output}"'
+        return response
 
 
 class PnlHistoryView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        snapshots = PortfolioSnapshot.objects.filter(
-            user=request.user
-        ).order_by('date').values(
-            'date', 'total_value', 'cash_balance', 'invested_value', 'daily_pnl'
-        )
-        return Response(list(snapshots))
+        """
+        GET /api/trading/pnl-history/?from=2024-01-01&to=2024-12-31&resolution=auto|daily|weekly|monthly|lttb&points=200
+        Without `resolution` or `points` the response keeps its original shape,
+        a bare list of daily rows with `daily_pnl`; either parameter opts into
+        {"from", "to", "resolution", "results"} with `pnl` per point.
+        """
+        params = request.query_params
+        resolution = params.get('resolution', 'lttb' if 'points' in params else None)
+        try:
+            start = date_param(request, 'from')
+            end = date_param(request, 'to')
+            if resolution is not None and resolution not in RESOLUTIONS:
+                raise ValueError(f"resolution must be one of: {', '.join(RESOLUTIONS)}")
+            points = None
+            if resolution == 'lttb':
+                points = _int_param(request, 'points', DEFAULT_POINTS)
+                points = max(MIN_POINTS, min(points, MAX_POINTS))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        history = get_pnl_history(request.user.id, start, end, resolution, points)
+        unchanged = not_modified(request, history['etag'])
+        if unchanged is not None:
+            return unchanged
+
+        response = HttpResponse(history['body'], content_type='application/json')
+        return set_validators(response, history['etag'])
+
+
+class EquityCurveView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    FIELDS = ('t', 'total_value', 'cash_balance', 'resolution')
+
+    def get(self, request):
+        """
+        GET /api/trading/equity-curve/?from=2024-06-03&to=2024-06-07
+        Portfolio value points between two IST dates (today by default):
+        5-minute points for recent days, daily and weekly closes further back.
+        """
+        try:
+            start = date_param(request, 'from') or timezone.localdate(timezone=IST)
+            end = date_param(request, 'to') or timezone.localdate(timezone=IST)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        points = PortfolioValuePoint.objects.filter(
+            user=request.user,
+            ts__gte=datetime.datetime.combine(start, datetime.time.min, tzinfo=IST),
+            ts__lt=datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min, tzinfo=IST),
+        ).order_by('ts').values_list('ts', 'total_value', 'cash_balance', 'resolution')
+
+        return Response({
+            'fields': self.FIELDS,
+            'points': [
+                [int(ts.timestamp()), float(total_value), float(cash_balance), resolution]
+                for ts, total_value, cash_balance, resolution in points
+            ],
+        })
+
+
+def _leaderboard_window(request):
+    window = request.query_params.get('window', 'all')
+    if window not in WINDOWS:
+        raise ValueError(f"window must be one of: {', '.join(WINDOWS)}")
+    return window
+
+
+def _int_param(request, name, default):
+    try:
+        return int(request.query_params.get(name, default))
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer")
 
 
 class LeaderboardView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        results = redis_client.zrevrange(LEADERBOARD_KEY, 0, 19, withscores=True)
+        """GET /api/trading/leaderboard/?window=weekly&cursor=20&limit=20"""
+        try:
+            window = _leaderboard_window(request)
+            cursor = _int_param(request, 'cursor', 0)
+            limit = _int_param(request, 'limit', DEFAULT_PAGE_SIZE)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        leaderboard = [
-            {
-                "rank": idx + 1,
-                "username": username,
-                "return_pct": round(score, 2),
-            }
-            for idx, (username, score) in enumerate(results)
-        ]
+        return Response(get_leaderboard_page(window=window, cursor=cursor, limit=limit))
+
+
+class LeaderboardRankView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """GET /api/trading/leaderboard/me/?window=daily&radius=5"""
+        try:
+            window = _leaderboard_window(request)
+            radius = _int_param(request, 'radius', 5)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(leaderboard)
\ No newline at end of file
+        return Response(get_rank_around(request.user.username, window=window, radius=radius))
@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+USER_CACHE_TTL = 60 * 5
+# Other processes drop their copy when the invalidation is published; the TTL
+# only bounds staleness while a process's listener is reconnecting
+LOCAL_USER_CACHE_TTL = 30
+LOCAL_USER_CACHE_SIZE = 10_000
+# Everything but the password hash; cached users load it lazily if anything asks,
+# and save() on them only writes these fields back
+CACHED_USER_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'risk_appetite',
+    'is_active', 'is_staff', 'is_superuser', 'date_joined', 'last_login',
+)
+
+INVALIDATION_CHANNEL = 'auth:user:invalidated'
+INVALIDATION_RETRY_SECONDS = 1
+
+_local_users = OrderedDict()
+_local_lock = threading.Lock()
+# pid of the process whose listener is running; a forked worker starts its own
+_listener_pid = None
+
+
+def _user_key(user_id) -> str:
+    return f"auth:user:{user_id}"
+
+
+def _to_raw(user: User) -> dict:
+    return {name: getattr(user, name) for name in CACHED_USER_FIELDS}
+
+
+def _from_raw(raw: dict) -> User:
+    # A fresh instance per request, so nothing a view sets on request.user leaks
+    # across requests. from_db wants the loaded values in model field order.
+    # The values can be stale, so code that saves request.user must pass
+    # update_fields; a plain save() writes every cached field back.
+    fields = [f for f in User._meta.concrete_fields if f.attname in raw]
+    return User.from_db(
+        DEFAULT_DB_ALIAS,
+        [f.attname for f in fields],
+        [f.to_python(raw[f.attname]) for f in fields],
+    )
+
+
+def _local_get(user_id):
+    with _local_lock:
+        entry = _local_users.get(user_id)
+        if entry is None:
+            return None
+        expires_at, raw = entry
+        if expires_at < time.monotonic():
+            del _local_users[user_id]
+            return None
+        _local_users.move_to_end(user_id)
+        return raw
+
+
+def _listen_for_invalidations() -> None:
+    while True:
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Anything published while we were disconnected is lost
+            with _local_lock:
+                _local_users.clear()
+            for message in pubsub.listen():
+                with _local_lock:
+                    _local_users.pop(message['data'], None)
+        except redis.RedisError as e:
+            logger.warning(f"Auth cache invalidation listener disconnected: {e}")
+            with _local_lock:
+                _local_users.clear()
+            time.sleep(INVALIDATION_RETRY_SECONDS)
+
+
+def _ensure_listener() -> None:
+    global _listener_pid
+    with _local_lock:
+        if _listener_pid == os.getpid():
+            return
+        _listener_pid = os.getpid()
+    threading.Thread(target=_listen_for_invalidations, name='auth-cache-invalidation', daemon=True).start()
+
+
+def _local_set(user_id, raw: dict) -> None:
+    _ensure_listener()
+    with _local_lock:
+        _local_users[user_id] = (time.monotonic() + LOCAL_USER_CACHE_TTL, raw)
+        _local_users.move_to_end(user_id)
+        while len(_local_users) > LOCAL_USER_CACHE_SIZE:
+            _local_users.popitem(last=False)
+
+
+def get_cached_user(user_id) -> User | None:
+    """
+    The user for a verified token: per-process cache, then Redis, then
+    Postgres. Only a Postgres load brings the wallet along (same query);
+    cached users don't carry it, so views that read `user.wallet` pay a query.
+    """
+    # Token claims and model ids don't always agree on int vs str
+    user_id = str(user_id)
+    raw = _local_get(user_id)
+    if raw is not None:
+        return _from_raw(raw)
+
+    try:
+        cached = redis_client.get(_user_key(user_id))
+    except redis.RedisError:
+        cached = None
+    if cached:
+        raw = json.loads(cached)
+        _local_set(user_id, raw)
+        return _from_raw(raw)
+
+    user = User.objects.select_related('wallet').filter(id=user_id).first()
+    if user is None:
+        return None
+
+    raw = _to_raw(user)
+    try:
+        redis_client.setex(_user_key(user_id), USER_CACHE_TTL, json.dumps(raw, cls=DjangoJSONEncoder))
+    except redis.RedisError:
+        pass
+    _local_set(user_id, json.loads(json.dumps(raw, cls=DjangoJSONEncoder)))
+    return user
+
+
+def invalidate_cached_user(user_id) -> None:
+    """
+    Drop a user from every cache tier, in every process. Called by the User
+    post_save / post_delete receivers in users.signals.
+    """
+    user_id = str(user_id)
+    with _local_lock:
+        _local_users.pop(user_id, None)
+    pipeline = redis_client.pipeline(transaction=False)
+    pipeline.delete(_user_key(user_id))
+    pipeline.publish(INVALIDATION_CHANNEL, user_id)
+    pipeline.execute()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    simplejwt authentication that verifies the token locally, as before, but
+    resolves the user through get_cached_user instead of a query per request.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Revocation compares against the password hash, which is never cached
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken('Token contained no recognizable user identification') from e
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
+
+
+_jwt_authentication = CachedJWTAuthentication()
+
+
+async def aauthenticate(request):
+    """
+    Resolve the user behind a plain (non-DRF) Django request's Bearer JWT.
+    Returns None when the header is missing or the token is invalid.
+    """
+    try:
+        result = await sync_to_async(_jwt_authentication.authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
@@ -0,0 +1,102 @@
+import json
+from urllib.parse import parse_qs
+
+from channels.auth import UserLazyObject
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import _from_raw, _jwt_authentication, _local_get, get_cached_user
+
+# Close code for a connection whose user was deactivated or deleted mid-session
+USER_REVOKED_CLOSE_CODE = 4401
+
+
+@database_sync_to_async
+def _user_for_token(raw_token: str):
+    try:
+        validated = _jwt_authentication.get_validated_token(raw_token)
+        return _jwt_authentication.get_user(validated)
+    except AuthenticationFailed:
+        return AnonymousUser()
+
+
+async def _refresh_user(user):
+    """
+    The connection's user as the auth cache has it now, or None once the
+    account is gone or inactive. Free while the per-process entry is live;
+    an invalidation drops that entry, so the next frame reloads the user.
+    """
+    raw = _local_get(str(user.pk))
+    fresh = _from_raw(raw) if raw is not None else await database_sync_to_async(get_cached_user)(user.pk)
+    if fresh is None or not fresh.is_active:
+        return None
+    return fresh
+
+
+def _auth_frame_token(text: str | None) -> str | None:
+    """The token from a `{"type": "auth", "token": ...}` frame, else None."""
+    try:
+        data = json.loads(text or '')
+    except json.JSONDecodeError:
+        return None
+    if isinstance(data, dict) and data.get('type') == 'auth' and isinstance(data.get('token'), str):
+        return data['token']
+    return None
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Websocket counterpart of CachedJWTAuthentication. The access token comes
+    from `?token=` on the connect URL, or from a first frame
+    `{"type": "auth", "token": "..."}` for clients that keep tokens out of
+    URLs. It is verified once and the user is resolved through the auth
+    cache into scope['user']. Each later frame re-reads the user from the
+    per-process cache (no DB work while it is warm), so permission changes
+    apply mid-connection and a deactivated or deleted user is disconnected
+    with USER_REVOKED_CLOSE_CODE.
+
+    An auth frame is consumed here and answered with
+    `{"type": "auth", "authenticated": bool}`. Consumers that need a user
+    check scope['user'].is_authenticated before serving a personal stream.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'websocket':
+            return await super().__call__(scope, receive, send)
+
+        scope = dict(scope)
+        # The router copies scope on the way to the consumer, so the user sits in
+        # a shared lazy object that a late auth frame can still fill in
+        scope['user'] = UserLazyObject()
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+        scope['user']._wrapped = await _user_for_token(token) if token else AnonymousUser()
+        first_frame = not scope['user'].is_authenticated
+
+        async def receive_with_auth():
+            nonlocal first_frame
+            message = await receive()
+            if message['type'] != 'websocket.receive':
+                return message
+
+            if first_frame:
+                first_frame = False
+                frame_token = _auth_frame_token(message.get('text'))
+                if frame_token is not None:
+                    scope['user']._wrapped = await _user_for_token(frame_token)
+                    await send({
+                        'type': 'websocket.send',
+                        'text': json.dumps({'type': 'auth', 'authenticated': scope['user'].is_authenticated}),
+                    })
+                    return await receive_with_auth()
+
+            if scope['user'].is_authenticated:
+                user = await _refresh_user(scope['user'])
+                if user is None:
+                    await send({'type': 'websocket.close', 'code': USER_REVOKED_CLOSE_CODE})
+                    return {'type': 'websocket.disconnect', 'code': USER_REVOKED_CLOSE_CODE}
+                scope['user']._wrapped = user
+            return message
+
+        return await self.inner(scope, receive_with_auth, send)
@@ -22,4 +22,12 @@ class SignupSerializer(serializers.ModelSerializer):
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'risk_appetite']
\ No newline at end of file
+        fields = ['id', 'username', 'email', 'risk_appetite']
+
+    def update(self, instance, validated_data):
+        # request.user comes from the auth cache; a plain save() would write
+        # its possibly stale is_active / is_staff back over the database row
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
\ No newline at end of file
@@ -1,3 +1,122 @@
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.testing import WebsocketCommunicator
 from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users import authentication
+from users.middleware import USER_REVOKED_CLOSE_CODE, JWTAuthMiddleware
+from users.models import Portfolio, User, Wallet
+
+
+def _clear_cached_user(user_id):
+    with authentication._local_lock:
+        authentication._local_users.pop(str(user_id), None)
+    authentication.redis_client.delete(authentication._user_key(user_id))
+
+
+class AuthCacheInvalidationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth-cache', password='pw12345!')
+        Wallet.objects.create(user=self.user)
+        Portfolio.objects.create(user=self.user)
+        _clear_cached_user(self.user.id)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def tearDown(self):
+        _clear_cached_user(self.user.id)
+
+    def _profile_status(self):
+        return self.client.get('/api/users/profile/').status_code
+
+    def test_deactivated_user_is_rejected_immediately(self):
+        self.assertEqual(self._profile_status(), 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        self.assertEqual(self._profile_status(), 401)
+
+    def test_deleted_user_is_rejected_immediately(self):
+        self.assertEqual(self._profile_status(), 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        self.assertEqual(self._profile_status(), 401)
+
+    def test_permission_change_reaches_the_cached_user(self):
+        self.assertFalse(authentication.get_cached_user(self.user.id).is_staff)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_staff = True
+            self.user.save()
+
+        self.assertTrue(authentication.get_cached_user(self.user.id).is_staff)
+
+    def test_invalidation_from_another_process_drops_the_local_copy(self):
+        authentication.get_cached_user(self.user.id)
+        self.assertIsNotNone(authentication._local_get(str(self.user.id)))
+
+        authentication.redis_client.publish(authentication.INVALIDATION_CHANNEL, str(self.user.id))
+
+        deadline = time.monotonic() + 2
+        while authentication._local_get(str(self.user.id)) is not None and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertIsNone(authentication._local_get(str(self.user.id)))
+
+    def test_profile_update_does_not_write_back_stale_cached_fields(self):
+        self.assertEqual(self._profile_status(), 200)
+        # Deactivated by a write that hasn't invalidated the cache yet
+        User.objects.filter(id=self.user.id).update(is_active=False)
+
+        response = self.client.patch('/api/users/profile/', {'risk_appetite': 'aggressive'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.risk_appetite, 'aggressive')
+        self.assertFalse(self.user.is_active)
+
+
+class EchoUserConsumer(AsyncWebsocketConsumer):
+
+    async def connect(self):
+        await self.accept()
+
+    async def receive(self, text_data=None, bytes_data=None):
+        await self.send(json.dumps({'user': self.scope['user'].username}))
+
+
+class WebsocketAuthTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='ws-auth', password='pw12345!')
+        _clear_cached_user(self.user.id)
+
+    def tearDown(self):
+        _clear_cached_user(self.user.id)
+
+    async def test_connection_is_closed_once_the_user_is_deactivated(self):
+        app = JWTAuthMiddleware(EchoUserConsumer.as_asgi())
+        communicator = WebsocketCommunicator(app, f'/ws/?token={AccessToken.for_user(self.user)}')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        await communicator.send_to(text_data='ping')
+        self.assertEqual(json.loads(await communicator.receive_from()), {'user': 'ws-auth'})
+
+        def deactivate():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.is_active = False
+                self.user.save()
+        await sync_to_async(deactivate)()
 
-# Create your tests here.
+        await communicator.send_to(text_data='ping')
+        self.assertEqual(await communicator.receive_output(), {'type': 'websocket.close', 'code': USER_REVOKED_CLOSE_CODE})